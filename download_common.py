@@ -0,0 +1,477 @@
+import csv
+import email.utils
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # 未安装 pyarrow 时只能写 JSONL / CSV
+    pa = pq = None
+
+# --- gnomAD / Ensembl 下载脚本共用的请求层 ---
+# 每个服务器 (主机名) 一个令牌桶，所有线程共享；遇到 429 / 5xx / 网络错误时按指数退避加随机抖动重试，
+# 服务器给出 Retry-After 时按其要求暂停该主机的全部请求。
+# 速率在没有被限流时逐步上调到配置的上限，收到 429 后减半，从而自动停在服务器能接受的最高速率附近
+RATE_LIMITS = {
+    "gnomad.broadinstitute.org": float(os.environ.get("GNOMAD_RPS", "1")),
+    "rest.ensembl.org": float(os.environ.get("ENSEMBL_RPS", "15")), # Ensembl REST 的公开限额为每秒 15 次
+}
+DEFAULT_RATE_LIMIT = float(os.environ.get("DOWNLOAD_RPS", "2")) # 其他主机 (包括本地替身服务器)
+MAX_RETRIES = int(os.environ.get("DOWNLOAD_RETRIES", "5"))
+BACKOFF_BASE = float(os.environ.get("DOWNLOAD_BACKOFF", "1")) # 第 n 次重试前最多等待 BACKOFF_BASE * 2**n 秒
+BACKOFF_MAX = 60
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 所有请求共用一个 Session: 同一主机的 TCP/TLS 连接保持复用 (keep-alive)，而不是每页、每个基因重新握手。
+# 连接池大小应不小于并发线程数，否则多出的线程用完连接后会被丢弃重建
+POOL_SIZE = int(os.environ.get("DOWNLOAD_POOL_SIZE", "16"))
+# 本地响应缓存: gnomAD 各版本和 Ensembl 查询结果在同一版本内不会变化，重复运行时直接使用磁盘上的结果。
+# 键由请求方法、端点路径 (不含主机，指向本地替身服务器时同样命中)、查询参数、请求体 (GraphQL 查询文本和变量) 以及命名空间
+# (数据集 / 版本) 计算；超过 CACHE_TTL 的条目视为过期，总大小超过 CACHE_MAX_BYTES 时先删最久未用的条目。
+# DOWNLOAD_OFFLINE=1 时只使用缓存 (包括已过期的条目)，缓存中没有的请求直接报错
+CACHE_ENABLED = os.environ.get("DOWNLOAD_CACHE", "1") not in ("", "0")
+CACHE_DIR = os.environ.get("DOWNLOAD_CACHE_DIR", ".http_cache")
+CACHE_TTL = float(os.environ.get("DOWNLOAD_CACHE_TTL", str(30 * 24 * 3600))) # 秒，0 表示永不过期
+CACHE_MAX_BYTES = int(float(os.environ.get("DOWNLOAD_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+OFFLINE = os.environ.get("DOWNLOAD_OFFLINE", "0") not in ("", "0")
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶: 令牌以 rate 个/秒补充，最多积累 burst 个，acquire() 没有令牌时阻塞。
+    throttle(seconds) 在被限流时让所有线程暂停这段时间并把速率减半 (不低于 min_rate；
+    多个线程同时收到 429 只算一次)，speed_up() 在成功请求后把速率逐步恢复到 max_rate。
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.1):
+        self.max_rate = self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.burst, self.tokens + (now - max(self.updated, self.paused_until)) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.max_rate = self.rate = rate
+            self.min_rate = min(self.min_rate, rate)
+
+    def speed_up(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def throttle(self, seconds):
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.paused_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """返回共享的 requests.Session (带连接池，声明接受 gzip 压缩的响应)。"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0) # 重试由 request_with_retry 负责
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+            _session = session
+        return _session
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_rate_limiter(url):
+    """返回 url 所在主机的令牌桶。"""
+    host = urlsplit(url).hostname or url
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT))
+        return _buckets[host]
+
+def set_rate_limit(url, rate):
+    """覆盖 url 所在主机的速率上限 (次/秒)。"""
+    get_rate_limiter(url).set_rate(rate)
+
+def _retry_after(response):
+    # Retry-After 可以是秒数或 HTTP 日期
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def _backoff(attempt):
+    # 指数退避加完全随机抖动，避免多个线程同时重试
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+class CacheMiss(requests.exceptions.ConnectionError):
+    """离线模式下请求不在缓存中。"""
+
+
+class ResponseCache:
+    """按内容寻址的磁盘响应缓存，每个条目一个 JSON 文件 (<目录>/<键前两位>/<键>.json)。"""
+
+    PRUNE_EVERY = 100 # 每写入多少个条目检查一次总大小
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, offline=OFFLINE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    @staticmethod
+    def key(method, url, params=None, body=None, namespace=None):
+        parts = urlsplit(url)
+        canonical = json.dumps({"method": method.upper(), "endpoint": parts.path.rstrip("/") or "/", "query": parts.query, "params": params,
+                                "body": body, "namespace": namespace}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """返回缓存的 requests.Response；不存在或已过期 (离线模式不判断过期) 时返回 None。"""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not self.offline and self.ttl and time.time() - entry["stored"] > self.ttl:
+            return None
+        try: os.utime(path) # 修改时间作为最近使用时间，用于按大小淘汰
+        except OSError: pass
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.headers.update(entry["headers"])
+        response.url = entry["url"]
+        response.from_cache = True
+        return response
+
+    def put(self, key, response):
+        # 只缓存成功的响应；GraphQL 在 200 响应里返回的错误也不缓存
+        if response.status_code != 200:
+            return
+        try:
+            if isinstance(response.json(), dict) and response.json().get("errors"):
+                return
+        except ValueError:
+            pass
+        self.store(key, response.url, response.text, response.status_code, response.headers.get("Content-Type", "application/json"))
+
+    def store(self, key, url, body, status=200, content_type="application/json"):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"stored": time.time(), "url": url, "status": status, "headers": {"Content-Type": content_type}, "body": body}
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.writes += 1
+            if self.writes % self.PRUNE_EVERY == 0:
+                self.prune()
+
+    def prune(self):
+        """删除过期条目，总大小仍超过上限时按最近使用时间从旧到新删除。返回删除的条目数。"""
+        entries, total, removed = [], 0, 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"): continue
+                path = os.path.join(root, name)
+                try: stat = os.stat(path)
+                except FileNotFoundError: continue
+                if self.ttl and time.time() - stat.st_mtime > self.ttl and not self.offline:
+                    os.remove(path); removed += 1
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path)); total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            os.remove(path); removed += 1; total -= size
+        return removed
+
+
+response_cache = ResponseCache() if CACHE_ENABLED else None
+
+def request_with_retry(method, url, max_retries=MAX_RETRIES, cache_namespace=None, **kwargs):
+    """
+    经过速率限制发送请求，429 / 5xx / 连接错误时重试。
+    返回最后一次的响应 (调用方照常 raise_for_status)；重试次数用完仍是网络错误时抛出该异常。
+    启用缓存时先查本地缓存 (命中不占用速率配额)，成功的响应写入缓存；cache_namespace 区分数据集 / 版本。
+    """
+    key = None
+    if response_cache is not None:
+        key = ResponseCache.key(method, url, kwargs.get("params"), kwargs.get("json", kwargs.get("data")), cache_namespace)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+        if response_cache.offline:
+            raise CacheMiss(f"离线模式: 缓存中没有 {method} {url} 的响应")
+    response = _request_with_retry(method, url, max_retries, **kwargs)
+    if key is not None:
+        response_cache.put(key, response)
+    return response
+
+def _request_with_retry(method, url, max_retries, **kwargs):
+    limiter = get_rate_limiter(url)
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = _backoff(attempt)
+            print(f"  请求 {url} 失败 ({e.__class__.__name__})，{delay:.1f} 秒后重试 ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+            continue
+        if response.status_code not in RETRY_STATUS:
+            limiter.speed_up()
+            return response
+        if attempt == max_retries:
+            return response
+        retry_after = _retry_after(response)
+        delay = _backoff(attempt) if retry_after is None else retry_after
+        print(f"  {url} 返回 {response.status_code}，{delay:.1f} 秒后重试 ({attempt + 1}/{max_retries})")
+        if response.status_code == 429 or retry_after is not None:
+            limiter.throttle(delay) # 暂停该主机的所有请求，下一次 acquire 会等到暂停结束
+        else:
+            time.sleep(delay)
+
+
+# --- 逐页写出 ---
+# 每获取一页就展平后写出，内存中最多只有一页数据: JSONL 每行一个变体，CSV / Parquet 每页一批 (Parquet 每页一个 row group)。
+# 列取自 columns 声明 (查询字段已知时应声明)，未声明时取第一页所有记录的列的并集；为 null 的嵌套对象 (如 "exome": null)
+# 写成对应叶子列 (exome.ac、exome.af ...) 为空，之后的页出现未知列时报错，而不是悄悄丢掉
+SINK_FORMATS = {".jsonl": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+def flatten(record, prefix=""):
+    """把嵌套字典展平为 "exome.ac" 这样以点连接的列名 (与 pandas.json_normalize 一致)，列表保持不变。"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+class PageSink:
+    """
+    把一页页记录展平后写入文件，格式按扩展名 (.jsonl / .csv / .parquet) 判断。
+    columns 为 {列名: "int" / "float" / "str" / "bool" / "list"}，同时决定列的顺序和 Parquet 中的类型；
+    float_columns 中的列在 Parquet 中固定为浮点数 (第一页恰好都是整数时也不会被推断成整数列)。
+    """
+
+    def __init__(self, path, columns=None, float_columns=()):
+        self.path = path
+        self.format = SINK_FORMATS.get(os.path.splitext(path)[1].lower())
+        if self.format is None:
+            raise ValueError(f"不支持的输出格式: {path}，可选: {', '.join(SINK_FORMATS)}")
+        if self.format == "parquet" and pa is None:
+            raise ValueError("写出 Parquet 需要安装 pyarrow (pip install pyarrow)")
+        self.declared = dict(columns) if columns else None
+        self.float_columns = set(float_columns)
+        self.columns = None
+        self.rows = 0
+        self._file = self._writer = self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _set_columns(self, rows, extra):
+        names = list(self.declared) if self.declared is not None else list(dict.fromkeys(name for row in rows for name in row if name not in extra))
+        names += [name for name in extra if name not in names] # gene 等附加字段放在最后
+        # 嵌套对象的路径 ("exome")，该对象为 null 时展平后只有这一个键，由它的叶子列代替
+        self._prefixes = {".".join(parts[:i]) for parts in (name.split(".") for name in names) for i in range(1, len(parts))}
+        self.columns = [name for name in names if name not in self._prefixes]
+        self._column_set = set(self.columns)
+
+    def _conform(self, row):
+        unknown = [name for name, value in row.items() if name not in self._column_set and not (value is None and name in self._prefixes)]
+        if unknown:
+            raise ValueError(f"第 {self.rows + 1} 条之后的记录中出现了第一页没有的列 {unknown}；请通过 columns 声明完整的列")
+        return {name: row.get(name) for name in self.columns}
+
+    def _parquet_schema(self, table):
+        types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "bool": pa.bool_(), "list": pa.list_(pa.string())}
+        fields = []
+        for field in table.schema:
+            kind = field.type
+            if field.name in self.float_columns: kind = pa.float64()
+            elif self.declared and field.name in self.declared: kind = types[self.declared[field.name]]
+            elif pa.types.is_null(kind): kind = pa.string() # 第一页全为空的列
+            elif pa.types.is_list(kind) and pa.types.is_null(kind.value_type): kind = pa.list_(pa.string())
+            fields.append(pa.field(field.name, kind))
+        return pa.schema(fields)
+
+    def write_page(self, records, **extra):
+        """写出一页记录，extra 中的字段 (如 gene) 追加到每条记录末尾。"""
+        rows = [dict(flatten(record), **extra) for record in records]
+        if not rows:
+            return
+        if self.columns is None:
+            self._set_columns(rows, extra)
+        rows = [self._conform(row) for row in rows]
+        if self.format == "jsonl":
+            if self._file is None: self._file = open(self.path, "w", encoding="utf-8")
+            self._file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        elif self.format == "csv":
+            if self._writer is None:
+                self._file = open(self.path, "w", encoding="utf-8", newline="")
+                self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+                self._writer.writeheader()
+            self._writer.writerows(rows)
+        else:
+            if self._writer is None:
+                self._schema = self._parquet_schema(pa.Table.from_pylist(rows))
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            try:
+                table = pa.Table.from_pylist(rows, schema=self._schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"第 {self.rows + 1} 条之后的记录与列类型不一致 ({e})；可通过 columns / float_columns 指定列类型") from e
+            self._writer.write_table(table)
+        self.rows += len(rows)
+
+    def close(self):
+        if self.format == "parquet":
+            if self._writer is not None: self._writer.close()
+            elif self.rows == 0: pq.write_table(pa.table({}), self.path) # 没有任何记录时也留下 (没有列的) 空文件
+        elif self._file is not None:
+            self._file.close()
+        elif self.rows == 0:
+            open(self.path, "w").close()
+        self._file = self._writer = None
+
+
+# --- Ensembl 基因坐标 ---
+ENSEMBL_SERVER = os.environ.get("ENSEMBL_SERVER", "https://rest.ensembl.org")
+ENSEMBL_BATCH_SIZE = 1000 # POST /lookup/id 每次最多 1000 个 ID
+
+def _gene_coordinates(data):
+    return {"chrom": str(data["seq_region_name"]), "start": data["start"], "end": data["end"], "gene_name": data.get("display_name") or data["id"]}
+
+def lookup_gene_coordinates(ensembl_ids, server=ENSEMBL_SERVER, batch_size=ENSEMBL_BATCH_SIZE):
+    """
+    批量查询 Ensembl 基因坐标，返回 {ID: {"chrom", "start", "end", "gene_name"}}，查不到的 ID 不在结果中。
+    每个 ID 的结果单独缓存 (与 GET /lookup/id/<ID> 同一个键)，只有缓存中没有的 ID 才合并成 POST /lookup/id 请求，
+    且不带 expand，不下载转录本和外显子。
+    """
+    coords, missing = {}, []
+    keys = {gid: ResponseCache.key("GET", f"{server}/lookup/id/{gid}", None, None, "ensembl") for gid in dict.fromkeys(ensembl_ids)}
+    for gid, key in keys.items():
+        cached = response_cache.get(key) if response_cache is not None else None
+        if cached is not None: coords[gid] = _gene_coordinates(cached.json())
+        else: missing.append(gid)
+    for i in range(0, len(missing), batch_size):
+        batch = missing[i:i + batch_size]
+        response = request_with_retry("POST", f"{server}/lookup/id", json={"ids": batch}, cache_namespace="ensembl",
+                                      headers={"Content-Type": "application/json", "Accept": "application/json"}, timeout=60)
+        response.raise_for_status()
+        for gid, data in response.json().items():
+            if not data: continue # 无效或已停用的 ID 返回 null
+            coords[gid] = _gene_coordinates(data)
+            if response_cache is not None:
+                response_cache.store(keys.get(gid) or ResponseCache.key("GET", f"{server}/lookup/id/{gid}", None, None, "ensembl"),
+                                     f"{server}/lookup/id/{gid}", json.dumps(data, ensure_ascii=False))
+    return coords
+
+
+# --- 本地替身服务器 ---
+# 用缓存回放 gnomAD / Ensembl 的响应，供测试或离线环境使用:
+#   python download_common.py serve --port 8765 --namespace gnomad_r4
+#   GNOMAD_API_URL=http://127.0.0.1:8765/api/ python downloadgemini.py CHD1
+# 缓存键不含主机，所以替身服务器查到的就是请求真实端点时写入的条目
+def serve(port=8765, namespace=None, cache=None):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    cache = cache or ResponseCache(offline=True)
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def _replay(self, body=None):
+            parts = urlsplit(self.path)
+            if body is not None:
+                try: body = json.loads(body)
+                except ValueError: body = body.decode("utf-8", "replace")
+            response = cache.get(ResponseCache.key(self.command, parts.path + ("?" + parts.query if parts.query else ""), None, body, namespace))
+            if response is None:
+                self.send_error(404, "not in cache")
+                return
+            self.send_response(response.status_code)
+            self.send_header("Content-Type", response.headers.get("Content-Type", "application/json"))
+            self.send_header("Content-Length", str(len(response.content)))
+            self.end_headers()
+            self.wfile.write(response.content)
+
+        def do_GET(self):
+            self._replay()
+
+        def do_POST(self):
+            self._replay(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), ReplayHandler)
+    print(f"从 {cache.directory} 回放缓存的响应: http://127.0.0.1:{port}/ (命名空间: {namespace})")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="下载缓存工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="启动用缓存回放响应的本地替身服务器")
+    p_serve.add_argument("--port", type=int, default=8765)
+    p_serve.add_argument("--namespace", default=None, help="与下载脚本传入的缓存命名空间一致 (如 gnomad_r4、ensembl)")
+    p_prune = sub.add_parser("prune", help="删除过期条目并把缓存压缩到大小上限以内")
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.port, args.namespace)
+    else:
+        print(f"删除了 {ResponseCache().prune()} 个缓存条目")
@@ -1,12 +1,28 @@
-import requests
-import pandas as pd
-import time
+import os
+from download_common import lookup_gene_coordinates, request_with_retry, PageSink
 
 # 1. gnomAD GraphQL 端点
-gnomad_api = "https://gnomad.broadinstitute.org/api"
+gnomad_api = os.environ.get("GNOMAD_API_URL", "https://gnomad.broadinstitute.org/api")
+# 查询使用服务器默认的数据集，这里记录它对应的 gnomAD 版本，作为本地响应缓存的命名空间:
+# gnomAD 发布新版本后改为新的版本号 (或设置 GNOMAD_RELEASE)，旧版本的缓存就不会再被使用
+gnomad_release = os.environ.get("GNOMAD_RELEASE", "gnomad_r4_1")
 
-# 2. 上面获得的基因坐标
-# gene_coords = {...}
+# 2. CHD1-9 的基因坐标: 一次批量 POST /lookup/id 从 Ensembl 获取 (结果缓存在本地)
+chd_genes = {
+    "CHD1": "ENSG00000153922",
+    "CHD2": "ENSG00000173575",
+    "CHD3": "ENSG00000170004",
+    "CHD4": "ENSG00000111642",
+    "CHD5": "ENSG00000116254",
+    "CHD6": "ENSG00000124177",
+    "CHD7": "ENSG00000171346",
+    "CHD8": "ENSG00000100888",
+    "CHD9": "ENSG00000177200",
+}
+lookup = lookup_gene_coordinates(chd_genes.values())
+gene_coords = {gene: lookup[gid] for gene, gid in chd_genes.items() if gid in lookup}
+for gene in chd_genes:
+    if gene not in gene_coords: print(f"未能获取 {gene} 的坐标，已跳过")
 
 # 3. GraphQL 查询模板
 query = """
@@ -32,26 +48,26 @@ query ($chrom: String!, $start: Int!, $stop: Int!) {
 }
 """
 
-all_variants = []
+# 4. 逐个基因查询，每个基因的变体展平后立即写入 CSV (也可改为 .jsonl / .parquet)，不在内存中累积
+output_file = "CHD1-9_gnomad_variants.csv"
 
-for gene, coords in gene_coords.items():
-    variables = {
-        "chrom": coords["chrom"],
-        "start": coords["start"],
-        "stop": coords["end"]
-    }
-    resp = requests.post(
-        gnomad_api,
-        json={"query": query, "variables": variables}
-    )
-    result = resp.json()
-    for v in result["data"]["region"]["variants"]:
-        v["gene"] = gene
-        all_variants.append(v)
-    # 为防限流，稍作停顿
-    time.sleep(1)
+variant_columns = {"variantId": "str", "pos": "int", "ref": "str", "alt": "str", "genomeAnnotations.consequence": "str",
+                   "alleleFreq.global.allele_freq": "float", "alleleFreq.global.homozygote_count": "int", "alleleFreq.global.hemizygote_count": "int"}
+
+with PageSink(output_file, columns=variant_columns) as sink:
+    for gene, coords in gene_coords.items():
+        variables = {
+            "chrom": coords["chrom"],
+            "start": coords["start"],
+            "stop": coords["end"]
+        }
+        # 速率限制与 429 / 5xx 重试由 download_common 处理
+        resp = request_with_retry(
+            "POST", gnomad_api,
+            json={"query": query, "variables": variables},
+            cache_namespace=gnomad_release # 响应按版本缓存在本地，重复运行不再请求 API
+        )
+        result = resp.json()
+        sink.write_page(result["data"]["region"]["variants"], gene=gene)
 
-# 4. 保存为 CSV
-df = pd.json_normalize(all_variants)
-df.to_csv("CHD1-9_gnomad_variants.csv", index=False)
-print("已保存至 CHD1-9_gnomad_variants.csv")
+print(f"已保存至 {output_file} ({sink.rows} 个变体)")
@@ -1,10 +1,11 @@
 import requests
 import json
-import time
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from download_common import RATE_LIMITS, SINK_FORMATS, PageSink, request_with_retry, set_rate_limit
 
 # --- 配置参数 ---
-GNOMAD_API_URL = "https://gnomad.broadinstitute.org/api/" # gnomAD API 端点
+GNOMAD_API_URL = os.environ.get("GNOMAD_API_URL", "https://gnomad.broadinstitute.org/api/") # gnomAD API 端点 (可指向本地替身服务器)
 GENES_TO_QUERY = [f"CHD{i}" for i in range(1, 10)] # 你想查询的基因列表
 
 # --- gnomAD v4.x 示例配置 (推荐) ---
@@ -23,11 +24,24 @@ REFERENCE_GENOME = "GRCh38" # 对于 v4.x 和 v3.x
 
 OUTPUT_DIR = "gnomad_data" # 输出目录
 VARIANTS_PER_PAGE = 500 # API 每次返回的变体数量上限 (根据 API 文档调整，通常几百到一千)
-REQUEST_DELAY = 1 # 请求之间的秒数延迟，以避免速率限制
+# 输出格式: "json" 为原始嵌套结构的 JSON 数组；"jsonl" / "csv" / "parquet" 把 exome / genome / consequence 等嵌套字段展平为
+# exome.ac 这样的列，逐页 (每 VARIANTS_PER_PAGE 条一批) 写出，内存中最多只有一页
+OUTPUT_FORMAT = os.environ.get("GNOMAD_OUTPUT_FORMAT", "json")
+# 展平后的列及类型 (与 build_variants_query 中的字段对应)；exome / genome 为 null 的变体在这些列中为空
+VARIANT_COLUMNS = {"variant_id": "str", "rsid": "str", "consequence.most_severe": "str",
+                   **{f"{source}.{field}": kind for source in ("exome", "genome")
+                      for field, kind in (("ac", "int"), ("an", "int"), ("af", "float"), ("homozygote_count", "int"), ("filters", "list"))}}
+# 并发下载: 多个基因同时分页获取，所有线程共享 download_common 中按主机划分的速率限制 (GNOMAD_RPS，每秒请求数)，
+# 因此提高并发数不会突破速率上限，只是把等待时间用在其他基因的请求上；429 / 5xx 会自动退避重试
+MAX_WORKERS = int(os.environ.get("GNOMAD_WORKERS", "4")) # 同时下载的基因数，1 表示逐个下载
+
+# 断点续传: 每获取一页就把变体追加到 <基因>_<数据集>_variants.jsonl.part，
+# 并在 CHECKPOINT_DIR 中记录下一页的 cursor 和已写入的字节数。中断 (网络错误、Ctrl+C) 后重新运行会从记录的 cursor 继续，
+# 而不是从第一页重新开始；已完成的基因直接跳过 (--restart 忽略断点重新下载)
+CHECKPOINT_DIR = os.path.join(OUTPUT_DIR, ".checkpoints")
 
 # 创建输出目录
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
+os.makedirs(CHECKPOINT_DIR, exist_ok=True)
 
 def build_variants_query(reference_genome):
     """
@@ -91,14 +105,93 @@ def build_variants_query(reference_genome):
     """
     return query
 
-def fetch_gnomad_variants_for_gene(gene_symbol, dataset_id, reference_genome):
+def checkpoint_path(gene_symbol, dataset_id):
+    return os.path.join(CHECKPOINT_DIR, f"{gene_symbol}_{dataset_id}.json")
+
+def pages_path(gene_symbol, dataset_id):
+    return os.path.join(OUTPUT_DIR, f"{gene_symbol}_{dataset_id}_variants.jsonl.part")
+
+def output_path(gene_symbol, dataset_id, output_format=OUTPUT_FORMAT):
+    return os.path.join(OUTPUT_DIR, f"{gene_symbol}_{dataset_id}_variants.{output_format}")
+
+def iter_pages(part_file):
+    """逐页 (每次最多 VARIANTS_PER_PAGE 条) 读回 .part 文件中的变体。"""
+    page = []
+    with open(part_file, encoding="utf-8") as f:
+        for line in f:
+            page.append(json.loads(line))
+            if len(page) >= VARIANTS_PER_PAGE:
+                yield page
+                page = []
+    if page:
+        yield page
+
+def write_output(part_file, output_filename, output_format):
+    # 先写临时文件再替换，写出中断时不会留下不完整的输出
+    tmp_filename = output_filename + ".tmp" + os.path.splitext(output_filename)[1]
+    if output_format == "json":
+        # 原始结构的 JSON 数组: 逐行转写，不把整个基因读入内存
+        with open(part_file, encoding="utf-8") as src, open(tmp_filename, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i, line in enumerate(src):
+                f.write(("," if i else "") + "\n  " + line.rstrip("\n"))
+            f.write("\n]\n")
+    else:
+        with PageSink(tmp_filename, columns=VARIANT_COLUMNS) as sink:
+            for page in iter_pages(part_file):
+                for variant in page:
+                    variant.pop("page_info", None) # 查询中附带的分页信息，不属于变体本身
+                sink.write_page(page)
+    os.replace(tmp_filename, output_filename)
+
+def load_checkpoint(gene_symbol, dataset_id, reference_genome):
+    """读取断点；查询参数 (参考基因组、每页数量) 与本次不同的断点视为无效。"""
+    try:
+        with open(checkpoint_path(gene_symbol, dataset_id), encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if checkpoint.get("reference_genome") != reference_genome or checkpoint.get("page_size") != VARIANTS_PER_PAGE:
+        return None
+    return checkpoint
+
+def save_checkpoint(checkpoint):
+    # 先写临时文件再替换，中断时不会留下写了一半的断点
+    path = checkpoint_path(checkpoint["gene"], checkpoint["dataset"])
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def append_page(path, variants_page):
+    """把一页变体以 JSON Lines 追加到文件并刷到磁盘，返回追加后的文件长度 (字节)。"""
+    with open(path, "ab") as f:
+        f.write("".join(json.dumps(v, ensure_ascii=False) + "\n" for v in variants_page).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+def fetch_gnomad_variants_for_gene(gene_symbol, dataset_id, reference_genome, resume=True):
     """
     为单个基因获取所有变体数据，处理分页。
+    每页写入 pages_path() 并更新断点；返回 (变体总数, 错误信息)。出错时已获取的页保留，下次运行从断点继续。
     """
-    print(f"开始为基因 {gene_symbol} (数据集: {dataset_id}, 参考基因组: {reference_genome}) 获取数据...")
-    all_variants = []
-    cursor = None
-    page_count = 0
+    checkpoint = load_checkpoint(gene_symbol, dataset_id, reference_genome) if resume else None
+    part_file = pages_path(gene_symbol, dataset_id)
+    if checkpoint and checkpoint["done"]:
+        print(f"基因 {gene_symbol} (数据集: {dataset_id}) 已下载完成，跳过。")
+        return checkpoint["variants"], None
+    if checkpoint and os.path.exists(part_file):
+        # 丢弃断点之后写入了一半的页
+        with open(part_file, "r+b") as f:
+            f.truncate(checkpoint["offset"])
+        print(f"从断点继续基因 {gene_symbol}: 已有 {checkpoint['pages']} 页、{checkpoint['variants']} 个变体 (cursor: {checkpoint['cursor']})")
+    else:
+        checkpoint = {"gene": gene_symbol, "dataset": dataset_id, "reference_genome": reference_genome, "page_size": VARIANTS_PER_PAGE,
+                      "cursor": None, "pages": 0, "variants": 0, "offset": 0, "done": False}
+        open(part_file, "wb").close()
+        print(f"开始为基因 {gene_symbol} (数据集: {dataset_id}, 参考基因组: {reference_genome}) 获取数据...")
+    cursor = checkpoint["cursor"]
+    page_count = checkpoint["pages"]
     graphql_query = build_variants_query(reference_genome)
 
     while True:
@@ -112,9 +205,10 @@ def fetch_gnomad_variants_for_gene(gene_symbol, dataset_id, reference_genome):
         }
         
         try:
-            response = requests.post(
-                GNOMAD_API_URL,
+            response = request_with_retry(
+                "POST", GNOMAD_API_URL,
                 json={"query": graphql_query, "variables": variables},
+                cache_namespace=dataset_id, # 同一数据集版本的结果不变，重复运行直接读本地缓存
                 timeout=30 # 设置超时
             )
             response.raise_for_status() # 如果 HTTP 状态码是 4xx 或 5xx，则抛出异常
@@ -129,11 +223,13 @@ def fetch_gnomad_variants_for_gene(gene_symbol, dataset_id, reference_genome):
 
             if not gene_data:
                 print(f"  未找到基因 {gene_symbol} 或该基因在此数据集中没有变体。")
-                return [], None # 返回空列表表示未找到或无变体
+                break # 按已完成处理 (输出空列表)
 
             variants_page = gene_data.get("variants")
             if variants_page:
-                all_variants.extend(variants_page)
+                checkpoint["offset"] = append_page(part_file, variants_page)
+                checkpoint["pages"] = page_count
+                checkpoint["variants"] += len(variants_page)
                 
                 page_info = variants_page[-1].get("page_info") if variants_page else None # page_info 在每个 variant 对象内
                 # 更稳妥的方式是检查 gene_data.variants 本身（如果API结构是这样的话）
@@ -242,7 +338,8 @@ def fetch_gnomad_variants_for_gene(gene_symbol, dataset_id, reference_genome):
                     page_info = page_info_container.get("page_info")
 
                     if page_info and page_info.get("has_next_page"):
-                        cursor = page_info.get("end_cursor")
+                        cursor = checkpoint["cursor"] = page_info.get("end_cursor")
+                        save_checkpoint(checkpoint) # 本页已落盘，记录下一页的位置
                     else:
                         break # 没有下一页了
                 else: # variants_page 为空
@@ -264,54 +361,74 @@ def fetch_gnomad_variants_for_gene(gene_symbol, dataset_id, reference_genome):
             print(f"  发生未知错误: {e}")
             return None, str(e)
 
-        time.sleep(REQUEST_DELAY) # 尊重 API 服务器
-
-    print(f"为基因 {gene_symbol} 获取完成。总共 {len(all_variants)} 个变体。")
-    return all_variants, None
+    checkpoint["done"] = True
+    save_checkpoint(checkpoint)
+    print(f"为基因 {gene_symbol} 获取完成。总共 {checkpoint['variants']} 个变体。")
+    return checkpoint["variants"], None
 
 
 # --- 主执行逻辑 ---
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="从 gnomAD GraphQL API 并发下载基因的变体数据")
+    parser.add_argument("genes", nargs="*", default=GENES_TO_QUERY, help="基因符号 (默认 CHD1-CHD9)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="同时下载的基因数")
+    parser.add_argument("--format", choices=["json"] + sorted(SINK_FORMATS.values()), default=OUTPUT_FORMAT, help="输出格式 (默认 json)")
+    parser.add_argument("--restart", action="store_true", help="忽略断点，所有基因从第一页重新下载")
+    parser.add_argument("--rps", type=float, default=RATE_LIMITS["gnomad.broadinstitute.org"], help="所有线程合计每秒最多请求数 (被限流时自动降低)")
+    args = parser.parse_args()
+    genes = args.genes
+    set_rate_limit(GNOMAD_API_URL, args.rps)
+
     print(f"将使用以下配置下载 gnomAD 数据:")
     print(f"  API URL: {GNOMAD_API_URL}")
-    print(f"  基因列表: {', '.join(GENES_TO_QUERY)}")
+    print(f"  基因列表: {', '.join(genes)}")
     print(f"  数据集 ID: {DATASET_ID}")
     print(f"  参考基因组: {REFERENCE_GENOME}")
-    print(f"  输出目录: {OUTPUT_DIR}\n")
+    print(f"  输出目录: {OUTPUT_DIR}")
+    print(f"  并发基因数: {args.workers}，速率上限: {args.rps} 次请求/秒\n")
 
     all_genes_data = {}
     errors_summary = {}
 
-    for gene in GENES_TO_QUERY:
-        variants, error = fetch_gnomad_variants_for_gene(gene, DATASET_ID, REFERENCE_GENOME)
-        
-        if error:
-            errors_summary[gene] = error
-            print(f"获取基因 {gene} 数据时出错: {error}")
-        elif variants is not None: # variants 可能为空列表（如果基因未找到或无变体）
-            all_genes_data[gene] = variants
-            
-            # 将每个基因的数据保存到单独的 JSON 文件
-            output_filename = os.path.join(OUTPUT_DIR, f"{gene}_{DATASET_ID}_variants.json")
-            try:
-                with open(output_filename, "w", encoding="utf-8") as f:
-                    json.dump(variants, f, indent=2, ensure_ascii=False)
-                print(f"基因 {gene} 的数据已保存到: {output_filename}")
-            except IOError as io_err:
-                print(f"保存文件 {output_filename} 时出错: {io_err}")
-                errors_summary[gene] = f"IOError: {io_err}"
-        else:
-            # variants is None, fetch_gnomad_variants_for_gene 内部已打印错误
-            pass
-        
-        print("-" * 30) # 分隔符
-        time.sleep(REQUEST_DELAY * 2) # 在处理完一个基因后可以稍作更长停顿
+    def save_gene(gene):
+        # 将每个基因的数据保存到单独的文件: 从逐页写入的 .part 文件流式转写
+        output_filename = output_path(gene, DATASET_ID, args.format)
+        part_file = pages_path(gene, DATASET_ID)
+        if not os.path.exists(part_file):
+            if not os.path.exists(output_filename): # 之前以其他格式保存过，原始页数据已删除
+                print(f"基因 {gene} 此前已下载并以其他格式保存，如需 {args.format} 格式请加 --restart 重新下载")
+            return # 之前的运行已保存
+        try:
+            write_output(part_file, output_filename, args.format)
+            os.remove(part_file)
+            print(f"基因 {gene} 的数据已保存到: {output_filename}")
+        except (IOError, ValueError) as io_err:
+            print(f"保存文件 {output_filename} 时出错: {io_err}")
+            errors_summary[gene] = f"IOError: {io_err}"
+
+    # 各基因在线程池中并发获取，完成一个保存一个
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(fetch_gnomad_variants_for_gene, gene, DATASET_ID, REFERENCE_GENOME, not args.restart): gene for gene in genes}
+        for future in as_completed(futures):
+            gene = futures[future]
+            variant_count, error = future.result()
+            if error:
+                errors_summary[gene] = error
+                print(f"获取基因 {gene} 数据时出错: {error} (已获取的页已保留，重新运行将从断点继续)")
+            elif variant_count is not None: # 可能为 0（如果基因未找到或无变体）
+                all_genes_data[gene] = variant_count
+                save_gene(gene)
+            else:
+                # variants is None, fetch_gnomad_variants_for_gene 内部已打印错误
+                pass
+            print("-" * 30) # 分隔符
 
     print("\n--- 下载摘要 ---")
     if all_genes_data:
         print("成功获取数据的基因:")
-        for gene, data_list in all_genes_data.items():
-            print(f"  - {gene}: {len(data_list)} 个变体")
+        for gene, variant_count in all_genes_data.items():
+            print(f"  - {gene}: {variant_count} 个变体")
     else:
         print("未能成功获取任何基因的数据。")
 
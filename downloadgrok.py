@@ -1,47 +1,101 @@
 import hail as hl
 import pandas as pd
-import requests
 import json
 import os
+from download_common import lookup_gene_coordinates
 
-def get_gene_coordinates(ensembl_id):
-    """Fetch gene coordinates from Ensembl REST API."""
-    server = "https://rest.ensembl.org"
-    endpoint = f"/lookup/id/{ensembl_id}?expand=1"
-    
+def get_gene_coordinates(ensembl_ids):
+    """Fetch gene coordinates for all IDs from Ensembl REST API in batched requests."""
     try:
-        response = requests.get(server + endpoint, headers={"Content-Type": "application/json"})
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'chrom': str(data['seq_region_name']),
-                'start': data['start'],
-                'end': data['end'],
-                'gene_name': data.get('display_name', ensembl_id)
-            }
-        else:
-            print(f"Failed to fetch coordinates for {ensembl_id}: {response.status_code}")
-            return None
+        # One POST /lookup/id per 1000 uncached IDs (no expand); per-ID results are cached on disk by download_common
+        coords = lookup_gene_coordinates(ensembl_ids)
     except Exception as e:
-        print(f"Error fetching coordinates for {ensembl_id}: {e}")
-        return None
+        print(f"Error fetching coordinates: {e}")
+        return {}
+    for ensembl_id in ensembl_ids:
+        if ensembl_id not in coords:
+            print(f"Failed to fetch coordinates for {ensembl_id}")
+    return coords
+
+def gene_interval(gene_info, reference_genome='GRCh38'):
+    """Parse a gene's Ensembl coordinates into a closed locus interval (GRCh38 contigs carry the 'chr' prefix)."""
+    chrom = gene_info['chrom']
+    if reference_genome == 'GRCh38':
+        chrom = 'chrM' if chrom == 'MT' else f"chr{chrom}"
+    return hl.parse_locus_interval(f"[{chrom}:{gene_info['start']}-{gene_info['end']}]", reference_genome=reference_genome)
+
+def download_gnomad_chd_data_single_pass(gnomad_dataset, gene_coords, output_file, reference_genome='GRCh38'):
+    """Filter all gene intervals in one pruned scan, annotate gene names by interval join and export once."""
+    # The gnomAD release is a sites Table (.ht), so it is read with read_table rather than read_matrix_table
+    ht = hl.read_table(gnomad_dataset)
+
+    # Evaluate the parsed intervals once so the same literal values drive both the filter and the join
+    intervals = hl.eval(hl.array([gene_interval(info, reference_genome) for info in gene_coords.values()]))
+    genes = list(zip(intervals, [info['gene_name'] for info in gene_coords.values()]))
+    for info in gene_coords.values():
+        print(f"Processing {info['gene_name']} on chr{info['chrom']}:{info['start']}-{info['end']}")
+
+    # filter_intervals on the row key lets Hail read only the partitions overlapping the genes
+    ht = hl.filter_intervals(ht, intervals)
 
-def download_gnomad_chd_data(ensembl_ids, output_file='chd1_9_variants.csv'):
+    # Interval join: look up every gene interval containing each locus (overlapping genes give one row per gene)
+    gene_ht = hl.Table.parallelize(
+        [hl.Struct(interval=interval, gene=gene) for interval, gene in genes],
+        hl.tstruct(interval=hl.tinterval(hl.tlocus(reference_genome)), gene=hl.tstr),
+        key='interval'
+    )
+
+    ht = ht.select(
+        variant_id=hl.delimit(ht.rsid, ';'),  # rsid is a set; Hail's export does not quote embedded commas
+        chrom=ht.locus.contig,
+        pos=ht.locus.position,
+        ref=ht.alleles[0],
+        alt=ht.alleles[1],
+        af=ht.freq[0].AF,  # Allele frequency
+        an=ht.freq[0].AN,  # Allele number
+        ac=ht.freq[0].AC,  # Allele count
+        gene=gene_ht.index(ht.locus, all_matches=True).gene
+    )
+    ht = ht.explode('gene')
+
+    # Drop the locus/alleles keys (alleles would print as an unquoted array) and export once instead of one to_pandas() per gene
+    ht = ht.key_by().drop('locus', 'alleles')
+    ht.export(output_file, delimiter=',')
+    print(f"Data saved to {output_file}")
+
+def download_gnomad_chd_data(ensembl_ids, output_file='chd1_9_variants.csv', single_pass=False):
     """Download gnomAD data for multiple genes and save to CSV."""
     # Initialize Hail
     hl.init()
 
     # Load gnomAD v3.1 genomes dataset
     gnomad_dataset = 'gs://gnomad-public-legacy/release/3.1.2/ht/genomes/gnomad.genomes.v3.1.2.hg38.ht'
+
+    # single_pass=True: one pruned scan over all genes (not yet verified against the full dataset)
+    if single_pass:
+        gene_coords = get_gene_coordinates(ensembl_ids)
+        for ensembl_id in ensembl_ids:
+            if ensembl_id not in gene_coords:
+                print(f"Skipping {ensembl_id} due to missing coordinates")
+        if gene_coords:
+            download_gnomad_chd_data_single_pass(gnomad_dataset, gene_coords, output_file)
+        else:
+            print("No data to save")
+        hl.stop()
+        return
+
+    # Per-gene path: one filter and to_pandas() per gene
     mt = hl.read_matrix_table(gnomad_dataset)
 
     # List to store DataFrames
     all_dfs = []
 
+    # Resolve all gene coordinates up front
+    gene_coords = get_gene_coordinates(ensembl_ids)
+
     # Process each gene
     for ensembl_id in ensembl_ids:
-        # Get gene coordinates
-        gene_info = get_gene_coordinates(ensembl_id)
+        gene_info = gene_coords.get(ensembl_id)
         if not gene_info:
             print(f"Skipping {ensembl_id} due to missing coordinates")
             continue
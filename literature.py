@@ -1,116 +1,24 @@
 import streamlit as st
-import json
 import datetime
+import io
+import math
 import os
 import pandas as pd # 新增
 import plotly.express as px # 新增
-
-# --- 配置 (与之前版本相同) ---
-LITERATURE_DATA_FILE = "reading_list.json"; BOOKS_MAGAZINES_DATA_FILE = "books_magazines_list.json"; MY_BLOG_POSTS_FILE = "my_blog_posts.json"; WEEKLY_PLAYLIST_FILE = "weekly_playlists.json"; WEEKLY_EXERCISE_LOG_FILE = "weekly_exercise_logs.json"
-STATUS_OPTIONS = ["待阅读", "阅读中", "已阅读"]; LITERATURE_CATEGORIES = ["生物", "医学", "计算机", "化学", "物理", "其他"]; BOOK_MAGAZINE_TYPES = ["书籍", "杂志"]; BOOK_STATUS_OPTIONS = ["想读", "在读", "已读"]; MY_BLOG_STATUS_OPTIONS = ["构思中", "草稿中", "待编辑", "待发布", "已发布", "搁置"]; MY_BLOG_PRIORITY_OPTIONS = ["高", "中", "低"]; PLAYLIST_STATUS_OPTIONS = ["想听", "在听", "已听过"]; EXERCISE_TYPES = ["跑步", "步行", "游泳", "自行车", "健身房(力量)", "健身房(有氧)", "瑜伽", "普拉提", "舞蹈", "球类运动", "其他"]; EXERCISE_LOG_STATUS_OPTIONS = ["计划中", "已完成", "部分完成", "未完成/跳过"]
-
-# --- 通用辅助函数 ---
-def get_current_week(): return datetime.date.today().isocalendar()[1]
-
-def load_json_data(filepath, default_data_structure=None):
-    if default_data_structure is None:
-        default_data_structure = []
-    if not os.path.exists(filepath):
-        # 如果文件不存在，创建一个空的JSON文件
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(default_data_structure, f, ensure_ascii=False, indent=4)
-        return default_data_structure
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if not isinstance(data, list): # 确保数据是列表
-                st.error(f"文件 {filepath} 格式错误，应为JSON列表。将使用默认空列表。")
-                return default_data_structure
-
-            # 为加载的数据设置默认值
-            if filepath == LITERATURE_DATA_FILE:
-                for i, entry in enumerate(data):
-                    entry.setdefault('id', entry.get('id', i + 1))
-                    entry.setdefault('title', "未命名文献")
-                    entry.setdefault('status', STATUS_OPTIONS[0])
-                    entry.setdefault('notes', "")
-                    entry.setdefault('categories', [])
-                    entry.setdefault('week_assigned', get_current_week())
-                    entry.setdefault('date_added', datetime.date.today().isoformat())
-            elif filepath == BOOKS_MAGAZINES_DATA_FILE:
-                 for i, entry in enumerate(data):
-                     entry.setdefault('id', entry.get('id', i + 1))
-                     entry.setdefault('title', "未命名条目")
-                     entry.setdefault('type', BOOK_MAGAZINE_TYPES[0])
-                     entry.setdefault('status', BOOK_STATUS_OPTIONS[0])
-                     entry.setdefault('progress', 0)
-                     entry.setdefault('issue_volume', "")
-                     entry.setdefault('date_added', datetime.date.today().isoformat())
-            elif filepath == MY_BLOG_POSTS_FILE:
-                for i, entry in enumerate(data):
-                    entry.setdefault('id', entry.get('id', i + 1))
-                    entry.setdefault('title', "未命名文章")
-                    entry.setdefault('status', MY_BLOG_STATUS_OPTIONS[0])
-                    entry.setdefault('due_date', None)
-                    entry.setdefault('publish_date', None)
-                    entry.setdefault('priority', MY_BLOG_PRIORITY_OPTIONS[1])
-                    entry.setdefault('topic_keywords', "")
-                    entry.setdefault('outline_notes', "")
-                    entry.setdefault('link_published', "")
-                    entry.setdefault('date_added', datetime.date.today().isoformat())
-            elif filepath == WEEKLY_PLAYLIST_FILE:
-                for i, entry in enumerate(data):
-                    entry.setdefault('id', entry.get('id', i + 1))
-                    entry.setdefault('week_assigned', get_current_week())
-                    entry.setdefault('song_title', "未命名歌曲")
-                    entry.setdefault('artist', "")
-                    entry.setdefault('album', "")
-                    entry.setdefault('status', PLAYLIST_STATUS_OPTIONS[0])
-                    entry.setdefault('notes', "")
-                    entry.setdefault('date_added', datetime.date.today().isoformat())
-            elif filepath == WEEKLY_EXERCISE_LOG_FILE:
-                for i, entry in enumerate(data):
-                    entry.setdefault('id', entry.get('id', i + 1))
-                    entry.setdefault('date', datetime.date.today().isoformat())
-                    entry.setdefault('exercise_type', EXERCISE_TYPES[0])
-                    entry.setdefault('duration_intensity', "")
-                    entry.setdefault('status', EXERCISE_LOG_STATUS_OPTIONS[0])
-                    entry.setdefault('notes', "")
-                    entry.setdefault('date_added', datetime.date.today().isoformat())
-            return data
-    except (json.JSONDecodeError, FileNotFoundError):
-        st.error(f"加载文件 {filepath} 失败或文件内容非标准JSON。将使用默认空列表。")
-        return default_data_structure
-
-def save_json_data(filepath, data):
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-def get_next_id(data_list):
-    if not data_list:
-        return 1
-    return max(entry.get('id', 0) for entry in data_list if isinstance(entry, dict)) + 1
-
-
-def update_entry_field(data_list, entry_id, field_name, new_value, data_file): # Renamed for clarity
-    entry_idx = next((idx for idx, item in enumerate(data_list) if isinstance(item, dict) and item.get('id') == entry_id), None)
-    if entry_idx is not None:
-        data_list[entry_idx][field_name] = new_value
-        save_json_data(data_file, data_list)
-    else:
-        st.error(f"更新失败：未找到 ID 为 {entry_id} 的条目。")
-
-def delete_entry_by_id(data_list, entry_id, data_file):
-    original_len = len(data_list)
-    # Ensure all items are dicts and have 'id' before filtering
-    data_list[:] = [entry for entry in data_list if not (isinstance(entry, dict) and entry.get('id') == entry_id)]
-    if len(data_list) < original_len:
-        save_json_data(data_file, data_list)
-        st.success(f"ID 为 {entry_id} 的条目已删除。")
-        return True
-    else:
-        st.warning(f"删除失败：未找到 ID 为 {entry_id} 的条目。")
-        return False
+from literature_storage import (
+    LITERATURE_DATA_FILE, BOOKS_MAGAZINES_DATA_FILE, MY_BLOG_POSTS_FILE, WEEKLY_PLAYLIST_FILE, WEEKLY_EXERCISE_LOG_FILE,
+    STATUS_OPTIONS, LITERATURE_CATEGORIES, BOOK_MAGAZINE_TYPES, BOOK_STATUS_OPTIONS, MY_BLOG_STATUS_OPTIONS, MY_BLOG_PRIORITY_OPTIONS,
+    PLAYLIST_STATUS_OPTIONS, EXERCISE_TYPES, EXERCISE_LOG_STATUS_OPTIONS,
+    get_current_week, load_json_data, get_next_id, append_entry, update_entry_field, delete_entry_by_id,
+    query_page, distinct_values, count_by, cached_for_collection, begin_write_batch, flush_write_batch,
+)
+from literature_import import detect_format, import_literature, format_report
+from literature_export import EXPORT_FORMATS, AVAILABLE_EXPORT_FORMATS, export_to_tempfile
+from literature_profile import PROFILE_ENABLED, PROFILE_HISTORY, start_profile, to_jsonl, to_chrome_trace, summarize
+
+# 开启 READLIST_PROFILE 时记录本次运行各阶段的耗时，结果显示在侧边栏底部
+profiler = start_profile()
+profiler.phase("页面初始化")
 
 
 # --- Streamlit 页面配置 和 CSS (与之前版本相同) ---
@@ -131,14 +39,90 @@ h3.stats-subheader { color: #007BFF; margin-top: 1.5rem; margin-bottom: 0.8rem;
 </style>""", unsafe_allow_html=True)
 
 # --- 数据加载 ---
-literature_list = load_json_data(LITERATURE_DATA_FILE, [])
-books_magazines_list = load_json_data(BOOKS_MAGAZINES_DATA_FILE, [])
-my_blog_posts_list = load_json_data(MY_BLOG_POSTS_FILE, [])
-weekly_playlists = load_json_data(WEEKLY_PLAYLIST_FILE, [])
-weekly_exercise_logs = load_json_data(WEEKLY_EXERCISE_LOG_FILE, [])
+# 本次运行中的所有修改先记在内存里，在 rerun 前或脚本结束时每个集合只落盘一次
+begin_write_batch()
+
+def finish_profile(interrupted=False):
+    if not PROFILE_ENABLED or profiler.total is not None: return
+    st.session_state['profile_run_count'] = st.session_state.get('profile_run_count', 0) + 1
+    profiler.label = f"#{st.session_state['profile_run_count']}"
+    runs = st.session_state.setdefault('profile_runs', [])
+    runs.append(profiler.finish(interrupted)); del runs[:-PROFILE_HISTORY]
+
+def profile_panel():
+    runs = st.session_state.get('profile_runs', [])
+    if not runs: return
+    run = runs[-1]
+    with st.sidebar.expander(f"⏱️ 运行耗时: {run.total * 1000:.0f} ms", expanded=False):
+        st.dataframe(pd.DataFrame([(name, cat, ms, ratio * 100) for name, cat, ms, ratio in summarize(run)], columns=["阶段", "类别", "耗时 (ms)", "占比"]), hide_index=True,
+                     column_config={"耗时 (ms)": st.column_config.NumberColumn(format="%.1f"), "占比": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f%%")})
+        interrupted = sum(r.interrupted for r in runs)
+        st.caption(f"可导出最近 {len(runs)} 次运行" + (f" (其中 {interrupted} 次因修改数据而提前重跑)" if interrupted else ""))
+        export_cols = st.columns(2)
+        export_cols[0].download_button("JSONL", data=to_jsonl(runs), file_name="readlist_profile.jsonl", mime="application/x-ndjson", key="profile_export_jsonl", on_click="ignore")
+        export_cols[1].download_button("Chrome trace", data=to_chrome_trace(runs), file_name="readlist_profile.trace.json", mime="application/json", key="profile_export_trace", on_click="ignore")
+
+def rerun():
+    conflicts = flush_write_batch()
+    if conflicts: st.session_state['write_conflicts'] = conflicts # rerun 后再显示
+    finish_profile(interrupted=True)
+    st.rerun()
+
+for conflict in st.session_state.pop('write_conflicts', []): st.warning(conflict)
+
+# --- 分页 ---
+# 每个列表只为当前页的条目构建控件；条目按 id 稳定排序，翻页、修改后顺序不变 (输入搜索词时按相关度排序)
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+DEFAULT_PAGE_SIZE = int(os.environ.get("READLIST_PAGE_SIZE", "20"))
+if DEFAULT_PAGE_SIZE not in PAGE_SIZE_OPTIONS: PAGE_SIZE_OPTIONS = sorted(PAGE_SIZE_OPTIONS + [DEFAULT_PAGE_SIZE])
+PAGE_ORDER_OPTIONS = ["最早添加在前", "最新添加在前"]
+
+def query_current_page(data_list, data_file, filters, key_prefix):
+    page_cols = st.columns([1, 1, 2, 0.6], vertical_alignment="bottom")
+    page_size = page_cols[0].selectbox("每页条数:", PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE), key=f"{key_prefix}_page_size")
+    order = page_cols[1].selectbox("排序:", PAGE_ORDER_OPTIONS, key=f"{key_prefix}_page_order")
+    search = page_cols[2].text_input("🔍 搜索:", key=f"{key_prefix}_search", placeholder="关键词，多个词用空格分隔", help="在标题、作者、备注等文本中检索，结果按相关度排序")
+    with page_cols[3].popover("📤 导出"):
+        export_controls(data_list, data_file, filters, key_prefix)
+    return query_page(data_list, data_file, filters, st.session_state.get(f"{key_prefix}_page", 1), page_size, order == PAGE_ORDER_OPTIONS[1], search)
+
+def export_controls(data_list, data_file, filters, key_prefix):
+    # 按当前筛选条件分块导出，点击下载时才在后台生成文件
+    export_fmt = st.radio("格式:", AVAILABLE_EXPORT_FORMATS, horizontal=True, key=f"{key_prefix}_export_fmt")
+    export_dates = st.date_input("日期范围 (可选):", value=[], key=f"{key_prefix}_export_dates")
+    date_from, date_to = (export_dates[0].isoformat(), export_dates[1].isoformat()) if len(export_dates) == 2 else (None, None)
+    st.caption("导出当前筛选条件下的全部条目 (不受搜索和分页影响)")
+    mime, ext = EXPORT_FORMATS[export_fmt]
+    export_filters = dict(filters)
+    st.download_button("下载", data=lambda: export_to_tempfile(data_list, data_file, export_fmt, export_filters, date_from, date_to),
+                       file_name=f"{os.path.splitext(data_file)[0]}{ext}", mime=mime, key=f"{key_prefix}_export", on_click="ignore")
+
+def format_year_week(year_week):
+    return year_week if year_week == "所有" else f"{year_week[0]} 年第 {year_week[1]} 周"
+
+def year_week_series(counts):
+    # {(ISO 年, 周): 数量} -> 按时间排序、以 "2025-W03" 为索引的 Series
+    return pd.Series({f"{year}-W{week:02d}": counts[(year, week)] for year, week in sorted(counts)}, dtype=int)
+
+def page_selector(total, key_prefix):
+    page_key = f"{key_prefix}_page"
+    pages = max(1, math.ceil(total / st.session_state[f"{key_prefix}_page_size"]))
+    if st.session_state.get(page_key, 1) > pages: st.session_state[page_key] = pages # 筛选后总页数变少
+    if pages > 1: st.number_input(f"页码 (共 {pages} 页):", min_value=1, max_value=pages, step=1, key=page_key)
+
+def load_collection(data_file):
+    with profiler.span(f"加载 {data_file}", "load"): return load_json_data(data_file, [])
+
+profiler.phase("加载数据")
+literature_list = load_collection(LITERATURE_DATA_FILE)
+books_magazines_list = load_collection(BOOKS_MAGAZINES_DATA_FILE)
+my_blog_posts_list = load_collection(MY_BLOG_POSTS_FILE)
+weekly_playlists = load_collection(WEEKLY_PLAYLIST_FILE)
+weekly_exercise_logs = load_collection(WEEKLY_EXERCISE_LOG_FILE)
 
 
 # --- 侧边栏 ---
+profiler.phase("侧边栏")
 st.sidebar.title("📝 内容与记录管理")
 
 with st.sidebar.expander("➕ 添加新文献", expanded=False):
@@ -173,10 +157,26 @@ with st.sidebar.expander("➕ 添加新文献", expanded=False):
                     "status": STATUS_OPTIONS[0], "categories": lit_categories,
                     "date_added": datetime.date.today().isoformat(), "notes": lit_notes
                 }
-                literature_list.append(new_lit_entry)
-                save_json_data(LITERATURE_DATA_FILE, literature_list)
+                append_entry(literature_list, new_lit_entry, LITERATURE_DATA_FILE)
                 st.sidebar.success(f"文献 '{lit_title}' 已添加.")
-                st.rerun()
+                rerun()
+
+with st.sidebar.expander("📥 批量导入文献", expanded=False):
+    # 解析、去重后所有新文献在本次运行结束时一次写入
+    if 'import_report' in st.session_state: st.success(st.session_state.pop('import_report'))
+    with st.form("import_literature_form_sidebar_v8", clear_on_submit=True):
+        import_file = st.file_uploader("BibTeX / RIS / CSV 文件:", type=["bib", "bibtex", "ris", "csv"], key="import_file_sb_v8")
+        import_categories = st.multiselect("为导入的文献设置分类:", options=LITERATURE_CATEGORIES, key="import_cat_sb_v8")
+        import_week_val = st.number_input("计划阅读周:", min_value=1, max_value=53, value=get_current_week(), key="import_week_sb_v8")
+        import_submitted = st.form_submit_button("开始导入")
+        if import_submitted:
+            if import_file is None: st.sidebar.error("请先选择要导入的文件！")
+            else:
+                try:
+                    import_report = import_literature(io.TextIOWrapper(import_file, encoding="utf-8-sig", newline=""), detect_format(import_file.name), literature_list, week=int(import_week_val), categories=import_categories)
+                except ValueError as e: st.sidebar.error(f"导入失败: {e}") # 包括文件不是 UTF-8 编码
+                else:
+                    st.session_state['import_report'] = format_report(import_report); rerun()
 
 with st.sidebar.expander("➕ 添加书籍/杂志", expanded=False):
     with st.form("add_book_magazine_form_sidebar_v8", clear_on_submit=True): # Key updated
@@ -188,7 +188,7 @@ with st.sidebar.expander("➕ 添加书籍/杂志", expanded=False):
             if not bm_title: st.sidebar.error("标题不能为空！")
             else:
                 new_bm_entry = {"id": get_next_id(books_magazines_list),"title": str(bm_title),"type": bm_type,"author_publisher": bm_author_publisher,"status": BOOK_STATUS_OPTIONS[0],"progress": bm_progress_val if bm_type == "书籍" else 0,"issue_volume": bm_issue_volume_val if bm_type == "杂志" else "","date_added": datetime.date.today().isoformat(),"notes": bm_notes}
-                books_magazines_list.append(new_bm_entry); save_json_data(BOOKS_MAGAZINES_DATA_FILE, books_magazines_list); st.sidebar.success(f"'{bm_title}' ({bm_type}) 已添加."); st.rerun()
+                append_entry(books_magazines_list, new_bm_entry, BOOKS_MAGAZINES_DATA_FILE); st.sidebar.success(f"'{bm_title}' ({bm_type}) 已添加."); rerun()
 
 with st.sidebar.expander("✍️ 添加新博客文章计划", expanded=False):
     with st.form("add_my_blog_post_form_sidebar_v8", clear_on_submit=True): # Key updated
@@ -197,7 +197,7 @@ with st.sidebar.expander("✍️ 添加新博客文章计划", expanded=False):
             if not post_title: st.sidebar.error("文章标题不能为空！")
             else:
                 new_post_entry = {"id": get_next_id(my_blog_posts_list),"title": str(post_title),"status": MY_BLOG_STATUS_OPTIONS[0],"priority": post_priority,"due_date": post_due_date_val.isoformat() if post_due_date_val else None,"publish_date": None,"topic_keywords": post_topic_keywords,"outline_notes": post_outline_notes,"link_published": "","date_added": datetime.date.today().isoformat()}
-                my_blog_posts_list.append(new_post_entry); save_json_data(MY_BLOG_POSTS_FILE, my_blog_posts_list); st.sidebar.success(f"博客计划 '{post_title}' 已添加."); st.rerun()
+                append_entry(my_blog_posts_list, new_post_entry, MY_BLOG_POSTS_FILE); st.sidebar.success(f"博客计划 '{post_title}' 已添加."); rerun()
 
 with st.sidebar.expander("🎵 添加到歌单", expanded=False):
     with st.form("add_playlist_item_form_sidebar_v8", clear_on_submit=True): # Key updated
@@ -205,8 +205,8 @@ with st.sidebar.expander("🎵 添加到歌单", expanded=False):
         if pl_submitted:
             if not pl_song_title: st.sidebar.error("歌曲标题不能为空！")
             else:
-                new_pl_entry = {"id": get_next_id(weekly_playlists),"week_assigned": pl_week_val,"song_title": str(pl_song_title),"artist": pl_artist,"album": pl_album,"status": PLAYLIST_STATUS_OPTIONS[0],"notes": pl_notes,"date_added": datetime.date.today().isoformat()}
-                weekly_playlists.append(new_pl_entry); save_json_data(WEEKLY_PLAYLIST_FILE, weekly_playlists); st.sidebar.success(f"歌曲 '{pl_song_title}' 已添加到歌单."); st.rerun()
+                new_pl_entry = {"id": get_next_id(weekly_playlists),"week_assigned": pl_week_val,"year_assigned": datetime.date.today().isocalendar()[0],"song_title": str(pl_song_title),"artist": pl_artist,"album": pl_album,"status": PLAYLIST_STATUS_OPTIONS[0],"notes": pl_notes,"date_added": datetime.date.today().isoformat()}
+                append_entry(weekly_playlists, new_pl_entry, WEEKLY_PLAYLIST_FILE); st.sidebar.success(f"歌曲 '{pl_song_title}' 已添加到歌单."); rerun()
 
 with st.sidebar.expander("🏃 添加运动记录", expanded=False):
     with st.form("add_exercise_log_form_sidebar_v8", clear_on_submit=True): # Key updated
@@ -215,7 +215,7 @@ with st.sidebar.expander("🏃 添加运动记录", expanded=False):
             if not ex_duration_intensity: st.sidebar.error("时长/强度等信息不能为空！")
             else:
                 new_ex_entry = {"id": get_next_id(weekly_exercise_logs),"date": ex_date_val.isoformat(),"exercise_type": ex_type_val,"duration_intensity": ex_duration_intensity,"status": EXERCISE_LOG_STATUS_OPTIONS[0],"notes": ex_notes,"date_added": datetime.date.today().isoformat()}
-                weekly_exercise_logs.append(new_ex_entry); save_json_data(WEEKLY_EXERCISE_LOG_FILE, weekly_exercise_logs); st.sidebar.success(f"{ex_date_val.isoformat()} 的 {ex_type_val} 记录已添加."); st.rerun()
+                append_entry(weekly_exercise_logs, new_ex_entry, WEEKLY_EXERCISE_LOG_FILE); st.sidebar.success(f"{ex_date_val.isoformat()} 的 {ex_type_val} 记录已添加."); rerun()
 
 st.sidebar.markdown("---"); st.sidebar.caption(f"当前周: {get_current_week()}")
 st.markdown("<h1 class='app-main-title'>🚀 个人生活与学习管理系统</h1>", unsafe_allow_html=True)
@@ -227,26 +227,27 @@ tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(tab_titles) # 新增 Tab
 #      学术文献 Tab
 # ==========================
 with tab1:
+    profiler.phase(f"{tab_titles[0]} 筛选")
     st.markdown(f"<h2 class='tab-header'>{tab_titles[0]}</h2>", unsafe_allow_html=True)
     # ... (筛选器部分保持不变) ...
     st.markdown("<h3 class='filter-header'>筛选文献</h3>", unsafe_allow_html=True)
     filter_cols = st.columns(3)
-    all_lit_weeks_set = set(entry.get('week_assigned') for entry in literature_list if entry.get('week_assigned') is not None)
-    all_lit_weeks = sorted(list(all_lit_weeks_set))
+    all_lit_weeks = distinct_values(literature_list, LITERATURE_DATA_FILE, 'week_assigned')
     sel_lit_week = filter_cols[0].selectbox("按周筛选:", options=["所有"] + all_lit_weeks, key="sel_lit_week_t1_v8")
     sel_lit_status = filter_cols[1].selectbox("按状态筛选:", options=["所有"] + STATUS_OPTIONS, key="sel_lit_status_t1_v8")
-    available_categories_set = set(cat for entry in literature_list for cat in entry.get('categories', []))
-    available_categories = sorted(list(available_categories_set))
+    available_categories = distinct_values(literature_list, LITERATURE_DATA_FILE, 'category')
     sel_lit_category = filter_cols[2].selectbox("按分类筛选:", options=["所有"] + available_categories, key="sel_lit_cat_t1_v8")
 
-    filtered_literature = literature_list
-    if sel_lit_week != "所有": filtered_literature = [e for e in filtered_literature if e.get('week_assigned') == sel_lit_week]
-    if sel_lit_status != "所有": filtered_literature = [e for e in filtered_literature if e.get('status') == sel_lit_status]
-    if sel_lit_category != "所有": filtered_literature = [e for e in filtered_literature if sel_lit_category in e.get('categories', [])]
+    lit_filters = {}
+    if sel_lit_week != "所有": lit_filters['week_assigned'] = sel_lit_week
+    if sel_lit_status != "所有": lit_filters['status'] = sel_lit_status
+    if sel_lit_category != "所有": lit_filters['category'] = sel_lit_category
+    lit_total, filtered_literature = query_current_page(literature_list, LITERATURE_DATA_FILE, lit_filters, "lit_t1_v8")
+    profiler.phase(f"{tab_titles[0]} 渲染")
 
     if not filtered_literature: st.info("没有符合条件的文献记录。")
     else:
-        st.markdown(f"找到 **{len(filtered_literature)}** 篇文献。")
+        st.markdown(f"找到 **{lit_total}** 篇文献。")
         for i, entry in enumerate(filtered_literature):
             title_display = str(entry.get('title', "无标题文献"))
             week_display = str(entry.get('week_assigned', 'N/A'))
@@ -259,6 +260,7 @@ with tab1:
                     if entry.get('authors'): st.markdown(f"**作者:** {entry.get('authors')}")
                     if entry.get('year'): st.markdown(f"**年份:** {entry.get('year')}")
                     if entry.get('source'): st.markdown(f"**来源:** {entry.get('source')}")
+                    if entry.get('doi'): st.markdown(f"**DOI:** [{entry.get('doi')}](https://doi.org/{entry.get('doi')})")
                     if entry.get('categories'): st.markdown(f"**分类:** {', '.join(entry.get('categories',[]))}")
                     if entry.get('notes'): st.markdown(f"**备注:** {entry.get('notes')}")
                     st.caption(f"添加日期: {entry.get('date_added', 'N/A')}")
@@ -268,29 +270,33 @@ with tab1:
                     new_status = st.selectbox("状态", STATUS_OPTIONS, index=current_status_idx, key=f"lit_status_select_t1_v8_{entry['id']}", label_visibility="collapsed")
                     if new_status != entry.get('status'):
                         update_entry_field(literature_list, entry['id'], 'status', new_status, LITERATURE_DATA_FILE)
-                        st.success(f"文献 '{title_display}' 状态更新."); st.rerun()
+                        st.success(f"文献 '{title_display}' 状态更新."); rerun()
                     
                     st.markdown("---") # 分隔线
                     if st.button("🗑️ 删除", key=f"del_lit_t1_v8_{entry['id']}", help="删除此文献记录"):
                         if delete_entry_by_id(literature_list, entry['id'], LITERATURE_DATA_FILE):
-                            st.rerun()
+                            rerun()
+        page_selector(lit_total, "lit_t1_v8")
 # ==========================
 #      书籍与杂志 Tab
 # ==========================
 with tab2:
+    profiler.phase(f"{tab_titles[1]} 筛选")
     st.markdown(f"<h2 class='tab-header'>{tab_titles[1]}</h2>", unsafe_allow_html=True)
     # ... (筛选器部分保持不变) ...
     st.markdown("<h3 class='filter-header'>筛选条目</h3>", unsafe_allow_html=True)
     bm_filter_cols = st.columns(2)
     sel_bm_type = bm_filter_cols[0].selectbox("按类型筛选:", options=["所有"] + BOOK_MAGAZINE_TYPES, key="sel_bm_type_t2_v8")
     sel_bm_status = bm_filter_cols[1].selectbox("按状态筛选:", options=["所有"] + BOOK_STATUS_OPTIONS, key="sel_bm_status_t2_v8")
-    filtered_books_magazines = books_magazines_list
-    if sel_bm_type != "所有": filtered_books_magazines = [e for e in filtered_books_magazines if e.get('type') == sel_bm_type]
-    if sel_bm_status != "所有": filtered_books_magazines = [e for e in filtered_books_magazines if e.get('status') == sel_bm_status]
+    bm_filters = {}
+    if sel_bm_type != "所有": bm_filters['type'] = sel_bm_type
+    if sel_bm_status != "所有": bm_filters['status'] = sel_bm_status
+    bm_total, filtered_books_magazines = query_current_page(books_magazines_list, BOOKS_MAGAZINES_DATA_FILE, bm_filters, "bm_t2_v8")
+    profiler.phase(f"{tab_titles[1]} 渲染")
 
     if not filtered_books_magazines: st.info("没有符合条件的书籍或杂志记录。")
     else:
-        st.markdown(f"找到 **{len(filtered_books_magazines)}** 个条目。")
+        st.markdown(f"找到 **{bm_total}** 个条目。")
         for i, entry in enumerate(filtered_books_magazines):
             icon = "📘" if entry.get('type') == "书籍" else "📰"
             title_display = str(entry.get('title', "无标题"))
@@ -311,7 +317,7 @@ with tab2:
                     new_bm_status = st.selectbox("状态", BOOK_STATUS_OPTIONS, index=current_bm_status_idx, key=f"bm_status_select_t2_v8_{entry['id']}", label_visibility="collapsed")
                     if new_bm_status != entry.get('status'):
                         update_entry_field(books_magazines_list, entry['id'], 'status', new_bm_status, BOOKS_MAGAZINES_DATA_FILE)
-                        st.success(f"条目 '{title_display}' 状态更新."); st.rerun()
+                        st.success(f"条目 '{title_display}' 状态更新."); rerun()
                     if entry.get('type') == "书籍":
                         st.markdown("**更新进度:**")
                         current_progress = entry.get('progress', 0)
@@ -320,37 +326,41 @@ with tab2:
                             update_entry_field(books_magazines_list, entry['id'], 'progress', new_progress, BOOKS_MAGAZINES_DATA_FILE)
                             status_changed_by_progress = False
                             # 查找更新后的条目以检查状态
-                            updated_entry_idx = next((idx for idx, item in enumerate(books_magazines_list) if item['id'] == entry['id']), None)
-                            if updated_entry_idx is not None:
-                                current_entry_status = books_magazines_list[updated_entry_idx]['status']
+                            updated_entry = books_magazines_list.get_by_id(entry['id'])
+                            if updated_entry is not None:
+                                current_entry_status = updated_entry['status']
                                 if new_progress == 100 and current_entry_status != "已读":
                                     update_entry_field(books_magazines_list, entry['id'], 'status', "已读", BOOKS_MAGAZINES_DATA_FILE)
                                     status_changed_by_progress = True; st.toast("书籍完成！🎉", icon="📚")
                                 elif new_progress > 0 and new_progress < 100 and current_entry_status == "想读":
                                      update_entry_field(books_magazines_list, entry['id'], 'status', "在读", BOOKS_MAGAZINES_DATA_FILE)
                                      status_changed_by_progress = True; st.toast("开始阅读！🚀", icon="📖")
-                            st.rerun()
+                            rerun()
 
                     st.markdown("---") # 分隔线
                     if st.button("🗑️ 删除", key=f"del_bm_t2_v8_{entry['id']}", help="删除此条目"):
                         if delete_entry_by_id(books_magazines_list, entry['id'], BOOKS_MAGAZINES_DATA_FILE):
-                            st.rerun()
+                            rerun()
+        page_selector(bm_total, "bm_t2_v8")
 
 # ==========================
 #      我的博客写作 Tab
 # ==========================
 with tab3:
+    profiler.phase(f"{tab_titles[2]} 筛选")
     st.markdown(f"<h2 class='tab-header'>{tab_titles[2]}</h2>", unsafe_allow_html=True)
     # ... (筛选器部分保持不变) ...
     st.markdown("<h3 class='filter-header'>筛选文章计划</h3>", unsafe_allow_html=True)
     post_filter_cols = st.columns(2); sel_post_status = post_filter_cols[0].selectbox("按状态筛选:", options=["所有"] + MY_BLOG_STATUS_OPTIONS, key="sel_post_status_t3_v8"); sel_post_priority = post_filter_cols[1].selectbox("按优先级筛选:", options=["所有"] + MY_BLOG_PRIORITY_OPTIONS, key="sel_post_priority_t3_v8")
-    filtered_posts = my_blog_posts_list
-    if sel_post_status != "所有": filtered_posts = [p for p in filtered_posts if p.get('status') == sel_post_status]
-    if sel_post_priority != "所有": filtered_posts = [p for p in filtered_posts if p.get('priority') == sel_post_priority]
+    post_filters = {}
+    if sel_post_status != "所有": post_filters['status'] = sel_post_status
+    if sel_post_priority != "所有": post_filters['priority'] = sel_post_priority
+    post_total, filtered_posts = query_current_page(my_blog_posts_list, MY_BLOG_POSTS_FILE, post_filters, "post_t3_v8")
+    profiler.phase(f"{tab_titles[2]} 渲染")
 
     if not filtered_posts: st.info("没有符合条件的博客文章计划。")
     else:
-        st.markdown(f"共有 **{len(filtered_posts)}** 篇文章计划。")
+        st.markdown(f"共有 **{post_total}** 篇文章计划。")
         for i, post in enumerate(filtered_posts):
             title_display = str(post.get('title', "无标题文章"))
             priority_display = str(post.get('priority', 'N/A'))
@@ -369,7 +379,7 @@ with tab3:
                             if new_outline_notes != current_outline_notes:
                                 if st.button("保存笔记", key=f"save_notes_blog_t3_v8_{post['id']}"): # 添加保存按钮
                                     update_entry_field(my_blog_posts_list, post['id'], 'outline_notes', new_outline_notes, MY_BLOG_POSTS_FILE)
-                                    st.rerun()
+                                    rerun()
                     if post.get('status') == "已发布":
                         if post.get('link_published'): st.markdown(f"**已发布链接:** [{post['link_published']}]({post['link_published']})")
                         else:
@@ -377,7 +387,7 @@ with tab3:
                             if st.button("保存链接", key=f"post_save_link_btn_t3_v8_{post['id']}"):
                                 if new_link:
                                     update_entry_field(my_blog_posts_list, post['id'], 'link_published', new_link, MY_BLOG_POSTS_FILE)
-                                    st.rerun()
+                                    rerun()
                         st.markdown(f"**发布日期:** {post.get('publish_date', 'N/A')}")
                     st.caption(f"添加日期: {post.get('date_added', 'N/A')}")
                 with cols_post_actions:
@@ -386,11 +396,11 @@ with tab3:
                         update_entry_field(my_blog_posts_list, post['id'], 'status', new_post_status, MY_BLOG_POSTS_FILE)
                         if new_post_status == "已发布" and not post.get('publish_date'):
                             update_entry_field(my_blog_posts_list, post['id'], 'publish_date', datetime.date.today().isoformat(), MY_BLOG_POSTS_FILE)
-                        st.rerun()
+                        rerun()
 
                     st.markdown("**更新优先级:**"); current_priority_idx = MY_BLOG_PRIORITY_OPTIONS.index(post.get('priority', MY_BLOG_PRIORITY_OPTIONS[1])); new_priority = st.selectbox("优先级", MY_BLOG_PRIORITY_OPTIONS, index=current_priority_idx, key=f"post_priority_select_t3_v8_{post['id']}", label_visibility="collapsed")
                     if new_priority != post.get('priority'):
-                        update_entry_field(my_blog_posts_list, post['id'], 'priority', new_priority, MY_BLOG_POSTS_FILE); st.rerun()
+                        update_entry_field(my_blog_posts_list, post['id'], 'priority', new_priority, MY_BLOG_POSTS_FILE); rerun()
 
                     st.markdown("**计划完成日期:**"); current_due_date_val = None;
                     if post.get('due_date'):
@@ -398,28 +408,32 @@ with tab3:
                         except ValueError: current_due_date_val = None
                     new_due_date = st.date_input("日期", value=current_due_date_val, key=f"post_due_date_input_t3_v8_{post['id']}", label_visibility="collapsed"); new_due_date_str = new_due_date.isoformat() if new_due_date else None
                     if new_due_date_str != post.get('due_date'):
-                        update_entry_field(my_blog_posts_list, post['id'], 'due_date', new_due_date_str, MY_BLOG_POSTS_FILE); st.rerun()
+                        update_entry_field(my_blog_posts_list, post['id'], 'due_date', new_due_date_str, MY_BLOG_POSTS_FILE); rerun()
                     
                     st.markdown("---")
                     if st.button("🗑️ 删除", key=f"del_blog_t3_v8_{post['id']}", help="删除此博客计划"):
                         if delete_entry_by_id(my_blog_posts_list, post['id'], MY_BLOG_POSTS_FILE):
-                            st.rerun()
+                            rerun()
+        page_selector(post_total, "post_t3_v8")
 
 # ==========================
 #      每周歌单 Tab
 # ==========================
 with tab4:
+    profiler.phase(f"{tab_titles[3]} 筛选")
     st.markdown(f"<h2 class='tab-header'>{tab_titles[3]}</h2>", unsafe_allow_html=True)
     # ... (筛选器部分保持不变) ...
     st.markdown("<h3 class='filter-header'>筛选歌单</h3>", unsafe_allow_html=True)
-    pl_filter_cols = st.columns(2); all_pl_weeks_set = set(entry.get('week_assigned', get_current_week()) for entry in weekly_playlists); all_pl_weeks = sorted(list(all_pl_weeks_set)); sel_pl_week = pl_filter_cols[0].selectbox("按周筛选:", options=["所有"] + all_pl_weeks, key="sel_pl_week_t4_v8"); sel_pl_status = pl_filter_cols[1].selectbox("按状态筛选:", options=["所有"] + PLAYLIST_STATUS_OPTIONS, key="sel_pl_status_t4_v8")
-    filtered_playlist = weekly_playlists
-    if sel_pl_week != "所有": filtered_playlist = [s for s in filtered_playlist if s.get('week_assigned') == sel_pl_week]
-    if sel_pl_status != "所有": filtered_playlist = [s for s in filtered_playlist if s.get('status') == sel_pl_status]
+    pl_filter_cols = st.columns(2); all_pl_weeks = distinct_values(weekly_playlists, WEEKLY_PLAYLIST_FILE, 'year_week'); sel_pl_week = pl_filter_cols[0].selectbox("按周筛选:", options=["所有"] + all_pl_weeks, format_func=format_year_week, key="sel_pl_week_t4_v8"); sel_pl_status = pl_filter_cols[1].selectbox("按状态筛选:", options=["所有"] + PLAYLIST_STATUS_OPTIONS, key="sel_pl_status_t4_v8")
+    pl_filters = {}
+    if sel_pl_week != "所有": pl_filters['year_week'] = sel_pl_week
+    if sel_pl_status != "所有": pl_filters['status'] = sel_pl_status
+    pl_total, filtered_playlist = query_current_page(weekly_playlists, WEEKLY_PLAYLIST_FILE, pl_filters, "pl_t4_v8")
+    profiler.phase(f"{tab_titles[3]} 渲染")
 
     if not filtered_playlist: st.info("本周歌单为空或无符合筛选的歌曲。")
     else:
-        st.markdown(f"歌单中 **{len(filtered_playlist)}** 首歌曲。")
+        st.markdown(f"歌单中 **{pl_total}** 首歌曲。")
         for i, song in enumerate(filtered_playlist):
             title_display = str(song.get('song_title', "无标题歌曲"))
             artist_display = str(song.get('artist', '未知歌手'))
@@ -439,34 +453,37 @@ with tab4:
                     new_pl_status = st.selectbox("状态", PLAYLIST_STATUS_OPTIONS, index=current_pl_status_idx, key=f"pl_status_select_t4_v8_{song['id']}", label_visibility="collapsed")
                     if new_pl_status != song.get('status'):
                         update_entry_field(weekly_playlists, song['id'], 'status', new_pl_status, WEEKLY_PLAYLIST_FILE)
-                        st.success(f"歌曲 '{title_display}' 状态更新."); st.rerun()
+                        st.success(f"歌曲 '{title_display}' 状态更新."); rerun()
                     
                     st.markdown("---")
                     if st.button("🗑️ 删除", key=f"del_pl_t4_v8_{song['id']}", help="从歌单删除此歌曲"):
                         if delete_entry_by_id(weekly_playlists, song['id'], WEEKLY_PLAYLIST_FILE):
-                            st.rerun()
+                            rerun()
+        page_selector(pl_total, "pl_t4_v8")
 
 # ==========================
 #      每周运动 Tab
 # ==========================
 with tab5:
+    profiler.phase(f"{tab_titles[4]} 筛选")
     st.markdown(f"<h2 class='tab-header'>{tab_titles[4]}</h2>", unsafe_allow_html=True)
     # ... (筛选器部分保持不变) ...
     st.markdown("<h3 class='filter-header'>筛选运动记录</h3>", unsafe_allow_html=True)
     ex_filter_cols = st.columns(3)
-    ex_weeks_set = set(datetime.date.fromisoformat(e['date']).isocalendar()[1] for e in weekly_exercise_logs if e.get('date'))
-    ex_weeks = sorted(list(ex_weeks_set), reverse=True)
-    sel_ex_week = ex_filter_cols[0].selectbox("按周筛选:", options=["所有"] + ex_weeks, key="sel_ex_week_t5_v8")
+    ex_weeks = distinct_values(weekly_exercise_logs, WEEKLY_EXERCISE_LOG_FILE, 'year_week')[::-1] # 最近的周在前
+    sel_ex_week = ex_filter_cols[0].selectbox("按周筛选:", options=["所有"] + ex_weeks, format_func=format_year_week, key="sel_ex_week_t5_v8")
     sel_ex_type = ex_filter_cols[1].selectbox("按运动类型筛选:", options=["所有"] + EXERCISE_TYPES, key="sel_ex_type_t5_v8")
     sel_ex_status = ex_filter_cols[2].selectbox("按状态筛选:", options=["所有"] + EXERCISE_LOG_STATUS_OPTIONS, key="sel_ex_status_t5_v8")
-    filtered_exercise_logs = weekly_exercise_logs
-    if sel_ex_week != "所有": filtered_exercise_logs = [log for log in filtered_exercise_logs if log.get('date') and datetime.date.fromisoformat(log['date']).isocalendar()[1] == sel_ex_week]
-    if sel_ex_type != "所有": filtered_exercise_logs = [log for log in filtered_exercise_logs if log.get('exercise_type') == sel_ex_type]
-    if sel_ex_status != "所有": filtered_exercise_logs = [log for log in filtered_exercise_logs if log.get('status') == sel_ex_status]
+    ex_filters = {}
+    if sel_ex_week != "所有": ex_filters['year_week'] = sel_ex_week
+    if sel_ex_type != "所有": ex_filters['exercise_type'] = sel_ex_type
+    if sel_ex_status != "所有": ex_filters['status'] = sel_ex_status
+    ex_total, filtered_exercise_logs = query_current_page(weekly_exercise_logs, WEEKLY_EXERCISE_LOG_FILE, ex_filters, "ex_t5_v8")
+    profiler.phase(f"{tab_titles[4]} 渲染")
 
     if not filtered_exercise_logs: st.info("没有符合条件的运动记录。")
     else:
-        st.markdown(f"共有 **{len(filtered_exercise_logs)}** 条运动记录。")
+        st.markdown(f"共有 **{ex_total}** 条运动记录。")
         for i, log_entry in enumerate(filtered_exercise_logs):
             log_date_str = log_entry.get('date', '未知日期')
             log_date_display = log_date_str
@@ -491,140 +508,148 @@ with tab5:
                     new_ex_status = st.selectbox("状态", EXERCISE_LOG_STATUS_OPTIONS, index=current_ex_status_idx, key=f"ex_status_select_t5_v8_{log_entry['id']}", label_visibility="collapsed")
                     if new_ex_status != log_entry.get('status'):
                         update_entry_field(weekly_exercise_logs, log_entry['id'], 'status', new_ex_status, WEEKLY_EXERCISE_LOG_FILE)
-                        st.success(f"运动记录状态更新."); st.rerun()
+                        st.success(f"运动记录状态更新."); rerun()
                     
                     st.markdown("---")
                     if st.button("🗑️ 删除", key=f"del_ex_t5_v8_{log_entry['id']}", help="删除此运动记录"):
                         if delete_entry_by_id(weekly_exercise_logs, log_entry['id'], WEEKLY_EXERCISE_LOG_FILE):
-                            st.rerun()
+                            rerun()
+        page_selector(ex_total, "ex_t5_v8")
 
 # ==========================
 #      统计与概览 Tab
 # ==========================
 with tab6:
+    profiler.phase(f"{tab_titles[5]} 学术文献")
     st.markdown(f"<h2 class='tab-header'>{tab_titles[5]}</h2>", unsafe_allow_html=True)
+    # 计数统一经 count_by 完成: 读取与筛选共用的列式视图 (sqlite 模式下为 GROUP BY 查询)，不再每次重跑都重建 DataFrame
+    # 每个集合的聚合结果和图表经 cached_for_collection 缓存，只有该集合被修改后才重新生成
 
     # --- 学术文献统计 ---
     st.markdown("<h3 class='stats-subheader'>学术文献统计</h3>", unsafe_allow_html=True)
     if not literature_list:
         st.info("暂无学术文献数据。")
     else:
-        df_lit = pd.DataFrame(literature_list)
+        def build_literature_charts():
+            status_counts_lit = pd.Series(count_by(literature_list, LITERATURE_DATA_FILE, 'status'))
+            fig_lit_status = px.pie(status_counts_lit, values=status_counts_lit.values, names=status_counts_lit.index, title="文献状态分布")
+            # categories 为列表字段，按单个分类计数
+            category_counts = pd.Series(count_by(literature_list, LITERATURE_DATA_FILE, 'category'))
+            fig_lit_cat = None if category_counts.empty else px.bar(category_counts, x=category_counts.index, y=category_counts.values, title="文献分类统计", labels={'x':'分类', 'y':'数量'})
+            return fig_lit_status, fig_lit_cat
+        fig_lit_status, fig_lit_cat = cached_for_collection(literature_list, LITERATURE_DATA_FILE, 'charts', profiler.timed("生成图表: 学术文献", build_literature_charts))
         col_lit1, col_lit2 = st.columns(2)
         with col_lit1:
-            st.metric("文献总数", len(df_lit))
-            status_counts_lit = df_lit['status'].value_counts()
-            fig_lit_status = px.pie(status_counts_lit, values=status_counts_lit.values, names=status_counts_lit.index, title="文献状态分布")
+            st.metric("文献总数", len(literature_list))
             st.plotly_chart(fig_lit_status, use_container_width=True)
         with col_lit2:
-            if 'categories' in df_lit.columns and not df_lit['categories'].empty:
-                # 处理列表类型的 categories
-                df_lit_categories_exploded = df_lit.explode('categories')
-                category_counts = df_lit_categories_exploded['categories'].value_counts()
-                if not category_counts.empty:
-                    fig_lit_cat = px.bar(category_counts, x=category_counts.index, y=category_counts.values, title="文献分类统计", labels={'x':'分类', 'y':'数量'})
-                    st.plotly_chart(fig_lit_cat, use_container_width=True)
-                else:
-                    st.caption("无分类数据")
+            if fig_lit_cat is not None:
+                st.plotly_chart(fig_lit_cat, use_container_width=True)
             else:
                 st.caption("无分类数据")
 
 
     # --- 书籍与杂志统计 ---
+    profiler.phase(f"{tab_titles[5]} 书籍与杂志")
     st.markdown("<h3 class='stats-subheader'>书籍与杂志统计</h3>", unsafe_allow_html=True)
     if not books_magazines_list:
         st.info("暂无书籍与杂志数据。")
     else:
-        df_bm = pd.DataFrame(books_magazines_list)
+        def build_books_charts():
+            type_counts_bm = pd.Series(count_by(books_magazines_list, BOOKS_MAGAZINES_DATA_FILE, 'type'))
+            fig_bm_type = px.pie(type_counts_bm, values=type_counts_bm.values, names=type_counts_bm.index, title="书籍/杂志类型分布")
+            status_counts_books = pd.Series(count_by(books_magazines_list, BOOKS_MAGAZINES_DATA_FILE, 'status', {'type': '书籍'}))
+            fig_books_status = None if status_counts_books.empty else px.bar(status_counts_books, x=status_counts_books.index, y=status_counts_books.values, title="书籍阅读状态", labels={'x':'状态', 'y':'数量'})
+            return fig_bm_type, fig_books_status
+        fig_bm_type, fig_books_status = cached_for_collection(books_magazines_list, BOOKS_MAGAZINES_DATA_FILE, 'charts', profiler.timed("生成图表: 书籍与杂志", build_books_charts))
         col_bm1, col_bm2 = st.columns(2)
         with col_bm1:
-            st.metric("条目总数", len(df_bm))
-            type_counts_bm = df_bm['type'].value_counts()
-            fig_bm_type = px.pie(type_counts_bm, values=type_counts_bm.values, names=type_counts_bm.index, title="书籍/杂志类型分布")
+            st.metric("条目总数", len(books_magazines_list))
             st.plotly_chart(fig_bm_type, use_container_width=True)
         with col_bm2:
-            df_books_only = df_bm[df_bm['type'] == '书籍']
-            if not df_books_only.empty:
-                status_counts_books = df_books_only['status'].value_counts()
-                fig_books_status = px.bar(status_counts_books, x=status_counts_books.index, y=status_counts_books.values, title="书籍阅读状态", labels={'x':'状态', 'y':'数量'})
+            if fig_books_status is not None:
                 st.plotly_chart(fig_books_status, use_container_width=True)
             else:
                 st.caption("无书籍数据进行状态统计")
 
 
     # --- 我的博客统计 ---
+    profiler.phase(f"{tab_titles[5]} 我的博客")
     st.markdown("<h3 class='stats-subheader'>我的博客统计</h3>", unsafe_allow_html=True)
     if not my_blog_posts_list:
         st.info("暂无博客文章计划数据。")
     else:
-        df_blog = pd.DataFrame(my_blog_posts_list)
+        def build_blog_charts():
+            status_counts_blog = pd.Series(count_by(my_blog_posts_list, MY_BLOG_POSTS_FILE, 'status'))
+            fig_blog_status = px.pie(status_counts_blog, values=status_counts_blog.values, names=status_counts_blog.index, title="博客文章状态分布")
+            priority_counts_blog = pd.Series(count_by(my_blog_posts_list, MY_BLOG_POSTS_FILE, 'priority'))
+            fig_blog_prio = px.bar(priority_counts_blog, x=priority_counts_blog.index, y=priority_counts_blog.values, title="博客文章优先级分布", labels={'x':'优先级', 'y':'数量'})
+            return fig_blog_status, fig_blog_prio
+        fig_blog_status, fig_blog_prio = cached_for_collection(my_blog_posts_list, MY_BLOG_POSTS_FILE, 'charts', profiler.timed("生成图表: 我的博客", build_blog_charts))
         col_blog1, col_blog2 = st.columns(2)
         with col_blog1:
-            st.metric("博客计划总数", len(df_blog))
-            status_counts_blog = df_blog['status'].value_counts()
-            fig_blog_status = px.pie(status_counts_blog, values=status_counts_blog.values, names=status_counts_blog.index, title="博客文章状态分布")
+            st.metric("博客计划总数", len(my_blog_posts_list))
             st.plotly_chart(fig_blog_status, use_container_width=True)
         with col_blog2:
-            priority_counts_blog = df_blog['priority'].value_counts()
-            fig_blog_prio = px.bar(priority_counts_blog, x=priority_counts_blog.index, y=priority_counts_blog.values, title="博客文章优先级分布", labels={'x':'优先级', 'y':'数量'})
             st.plotly_chart(fig_blog_prio, use_container_width=True)
 
 
     # --- 每周歌单统计 ---
+    profiler.phase(f"{tab_titles[5]} 每周歌单")
     st.markdown("<h3 class='stats-subheader'>每周歌单统计</h3>", unsafe_allow_html=True)
     if not weekly_playlists:
         st.info("暂无歌单数据。")
     else:
-        df_pl = pd.DataFrame(weekly_playlists)
+        def build_playlist_charts():
+            status_counts_pl = pd.Series(count_by(weekly_playlists, WEEKLY_PLAYLIST_FILE, 'status'))
+            fig_pl_status = px.pie(status_counts_pl, values=status_counts_pl.values, names=status_counts_pl.index, title="歌曲状态分布")
+            # 歌曲数量按 (ISO 年, 周) 统计，不同年份的同一周分开
+            week_counts_pl = year_week_series(count_by(weekly_playlists, WEEKLY_PLAYLIST_FILE, 'year_week'))
+            fig_pl_week = None if week_counts_pl.empty else px.bar(week_counts_pl, x=week_counts_pl.index, y=week_counts_pl.values, title="每周计划歌曲数", labels={'x':'周', 'y':'歌曲数'})
+            return fig_pl_status, fig_pl_week
+        fig_pl_status, fig_pl_week = cached_for_collection(weekly_playlists, WEEKLY_PLAYLIST_FILE, 'charts', profiler.timed("生成图表: 每周歌单", build_playlist_charts))
         col_pl1, col_pl2 = st.columns(2)
         with col_pl1:
-            st.metric("歌单歌曲总数", len(df_pl))
-            status_counts_pl = df_pl['status'].value_counts()
-            fig_pl_status = px.pie(status_counts_pl, values=status_counts_pl.values, names=status_counts_pl.index, title="歌曲状态分布")
+            st.metric("歌单歌曲总数", len(weekly_playlists))
             st.plotly_chart(fig_pl_status, use_container_width=True)
         with col_pl2:
-            # 歌曲数量按周统计 (如果周数较多，条形图可能更好)
-            if 'week_assigned' in df_pl.columns:
-                week_counts_pl = df_pl['week_assigned'].value_counts().sort_index()
-                if not week_counts_pl.empty:
-                    fig_pl_week = px.bar(week_counts_pl, x=week_counts_pl.index, y=week_counts_pl.values, title="每周计划歌曲数", labels={'x':'周数', 'y':'歌曲数'})
-                    st.plotly_chart(fig_pl_week, use_container_width=True)
-                else:
-                    st.caption("无周分配数据")
+            if fig_pl_week is not None:
+                st.plotly_chart(fig_pl_week, use_container_width=True)
             else:
                 st.caption("无周分配数据")
 
 
     # --- 每周运动统计 ---
+    profiler.phase(f"{tab_titles[5]} 每周运动")
     st.markdown("<h3 class='stats-subheader'>每周运动统计</h3>", unsafe_allow_html=True)
     if not weekly_exercise_logs:
         st.info("暂无运动记录数据。")
     else:
-        df_ex = pd.DataFrame(weekly_exercise_logs)
+        def build_exercise_charts():
+            type_counts_ex = pd.Series(count_by(weekly_exercise_logs, WEEKLY_EXERCISE_LOG_FILE, 'exercise_type'))
+            fig_ex_type = px.bar(type_counts_ex, y=type_counts_ex.index, x=type_counts_ex.values, orientation='h', title="运动类型统计", labels={'y':'类型', 'x':'次数'})
+            fig_ex_type.update_layout(yaxis={'categoryorder':'total ascending'}) # 按次数排序
+            status_counts_ex = pd.Series(count_by(weekly_exercise_logs, WEEKLY_EXERCISE_LOG_FILE, 'status'))
+            fig_ex_status = px.pie(status_counts_ex, values=status_counts_ex.values, names=status_counts_ex.index, title="运动记录状态分布")
+            # 运动次数按周统计 (无效日期的记录不计入)
+            exercise_freq_weekly = year_week_series(count_by(weekly_exercise_logs, WEEKLY_EXERCISE_LOG_FILE, 'year_week'))
+            fig_ex_freq = None if exercise_freq_weekly.empty else px.line(exercise_freq_weekly, x=exercise_freq_weekly.index, y=exercise_freq_weekly.values, title="每周运动次数", markers=True, labels={'x':'周', 'y':'次数'})
+            return fig_ex_type, fig_ex_status, fig_ex_freq
+        fig_ex_type, fig_ex_status, fig_ex_freq = cached_for_collection(weekly_exercise_logs, WEEKLY_EXERCISE_LOG_FILE, 'charts', profiler.timed("生成图表: 每周运动", build_exercise_charts))
         col_ex1, col_ex2 = st.columns(2)
 
         with col_ex1:
-            st.metric("运动记录总数", len(df_ex))
-            type_counts_ex = df_ex['exercise_type'].value_counts()
-            fig_ex_type = px.bar(type_counts_ex, y=type_counts_ex.index, x=type_counts_ex.values, orientation='h', title="运动类型统计", labels={'y':'类型', 'x':'次数'})
-            fig_ex_type.update_layout(yaxis={'categoryorder':'total ascending'}) # 按次数排序
+            st.metric("运动记录总数", len(weekly_exercise_logs))
             st.plotly_chart(fig_ex_type, use_container_width=True)
         with col_ex2:
-            status_counts_ex = df_ex['status'].value_counts()
-            fig_ex_status = px.pie(status_counts_ex, values=status_counts_ex.values, names=status_counts_ex.index, title="运动记录状态分布")
             st.plotly_chart(fig_ex_status, use_container_width=True)
 
-        # 运动次数按周统计
-        if 'date' in df_ex.columns:
-            try:
-                df_ex['parsed_date'] = pd.to_datetime(df_ex['date'], errors='coerce')
-                df_ex_valid_dates = df_ex.dropna(subset=['parsed_date'])
-                if not df_ex_valid_dates.empty:
-                    df_ex_valid_dates['week_of_year'] = df_ex_valid_dates['parsed_date'].dt.isocalendar().week
-                    exercise_freq_weekly = df_ex_valid_dates['week_of_year'].value_counts().sort_index()
-                    fig_ex_freq = px.line(exercise_freq_weekly, x=exercise_freq_weekly.index, y=exercise_freq_weekly.values, title="每周运动次数", markers=True, labels={'x':'周数', 'y':'次数'})
-                    st.plotly_chart(fig_ex_freq, use_container_width=True)
-                else:
-                    st.caption("无有效日期进行周统计")
-            except Exception as e:
-                st.caption(f"处理运动日期时出错: {e}")
+        if fig_ex_freq is not None:
+            st.plotly_chart(fig_ex_freq, use_container_width=True)
+        else:
+            st.caption("无有效日期进行周统计")
+
+profiler.phase("写回数据")
+for conflict in flush_write_batch(): st.warning(conflict)
+finish_profile()
+profile_panel()
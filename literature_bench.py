@@ -0,0 +1,238 @@
+import datetime
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from literature_storage import (
+    LITERATURE_DATA_FILE, BOOKS_MAGAZINES_DATA_FILE, MY_BLOG_POSTS_FILE, WEEKLY_PLAYLIST_FILE, WEEKLY_EXERCISE_LOG_FILE, DATA_FILES,
+    STATUS_OPTIONS, LITERATURE_CATEGORIES, BOOK_MAGAZINE_TYPES, BOOK_STATUS_OPTIONS, MY_BLOG_STATUS_OPTIONS, MY_BLOG_PRIORITY_OPTIONS,
+    PLAYLIST_STATUS_OPTIONS, EXERCISE_TYPES, EXERCISE_LOG_STATUS_OPTIONS, STORAGE_MODE,
+    load_json_data, save_json_data, forget_loaded, reset_storage, get_next_id, update_entry_field, delete_entry_by_id,
+    begin_write_batch, flush_write_batch, query_page, distinct_values, count_by,
+)
+
+# --- 性能基准 ---
+# 为五个集合生成指定规模的合成数据，在临时目录中测量加载、保存、分配 id、修改、删除、
+# 各 tab 的筛选分页以及统计页的聚合；可选地用 AppTest 无界面运行 literature.py 测量整次重跑的耗时。
+# 每项结果追加为 bench_results.jsonl 中的一行 (带提交号和存储模式)，不同修改之间的结果可以直接对比。
+# 存储模式由 READLIST_STORAGE 决定，与应用本身一致
+BENCH_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+BENCH_RESULTS_FILE = "bench_results.jsonl"
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "literature.py")
+BENCH_COLLECTIONS = {"literature": LITERATURE_DATA_FILE, "books": BOOKS_MAGAZINES_DATA_FILE, "blog": MY_BLOG_POSTS_FILE, "playlist": WEEKLY_PLAYLIST_FILE, "exercise": WEEKLY_EXERCISE_LOG_FILE}
+
+_WORDS = ["gene", "protein", "cell", "model", "network", "analysis", "single", "variant", "genome", "deep", "learning", "regulation",
+          "基因", "蛋白", "细胞", "模型", "网络", "分析", "变异", "表达", "调控", "测序", "学习", "数据"]
+
+# --- 合成数据 ---
+def _text(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+def _date(rng, days=730):
+    return (datetime.date.today() - datetime.timedelta(days=rng.randrange(days))).isoformat()
+
+def _literature_entry(rng, i):
+    return {"id": i, "title": _text(rng, 8), "authors": f"Author {rng.randrange(5000)}, Author {rng.randrange(5000)}", "year": rng.randrange(1990, 2027),
+            "source": f"Journal {rng.randrange(300)}", "doi": f"10.{rng.randrange(1000, 9999)}/bench.{i}", "week_assigned": rng.randrange(1, 53),
+            "status": rng.choice(STATUS_OPTIONS), "categories": rng.sample(LITERATURE_CATEGORIES, rng.randrange(0, 3)), "date_added": _date(rng), "notes": _text(rng, 12)}
+
+def _books_entry(rng, i):
+    return {"id": i, "title": _text(rng, 4), "type": rng.choice(BOOK_MAGAZINE_TYPES), "author_publisher": f"Publisher {rng.randrange(500)}",
+            "status": rng.choice(BOOK_STATUS_OPTIONS), "progress": rng.randrange(0, 101, 5), "issue_volume": f"Vol. {rng.randrange(1, 60)}", "notes": _text(rng, 6), "date_added": _date(rng)}
+
+def _blog_entry(rng, i):
+    return {"id": i, "title": _text(rng, 5), "status": rng.choice(MY_BLOG_STATUS_OPTIONS), "priority": rng.choice(MY_BLOG_PRIORITY_OPTIONS),
+            "due_date": _date(rng), "publish_date": None, "topic_keywords": _text(rng, 3), "outline_notes": _text(rng, 20), "link_published": "", "date_added": _date(rng)}
+
+def _playlist_entry(rng, i):
+    date_added = _date(rng)
+    return {"id": i, "week_assigned": rng.randrange(1, 53), "year_assigned": datetime.date.fromisoformat(date_added).isocalendar()[0], "song_title": _text(rng, 3),
+            "artist": f"Artist {rng.randrange(2000)}", "album": f"Album {rng.randrange(4000)}", "status": rng.choice(PLAYLIST_STATUS_OPTIONS), "notes": "", "date_added": date_added}
+
+def _exercise_entry(rng, i):
+    return {"id": i, "date": _date(rng), "exercise_type": rng.choice(EXERCISE_TYPES), "duration_intensity": f"{rng.randrange(10, 120)} 分钟",
+            "status": rng.choice(EXERCISE_LOG_STATUS_OPTIONS), "notes": _text(rng, 4), "date_added": _date(rng)}
+
+ENTRY_GENERATORS = {LITERATURE_DATA_FILE: _literature_entry, BOOKS_MAGAZINES_DATA_FILE: _books_entry, MY_BLOG_POSTS_FILE: _blog_entry,
+                    WEEKLY_PLAYLIST_FILE: _playlist_entry, WEEKLY_EXERCISE_LOG_FILE: _exercise_entry}
+
+def generate_entries(data_file, size, seed=0):
+    """生成 size 条合成条目 (id 从 1 连续编号)，同一 seed 的结果相同。"""
+    rng = random.Random(f"{seed}:{data_file}")
+    make = ENTRY_GENERATORS[data_file]
+    return [make(rng, i) for i in range(1, size + 1)]
+
+# --- 各 tab 的筛选 (与 literature.py 中的筛选控件对应) 与统计页的聚合 ---
+TAB_FILTERS = {
+    LITERATURE_DATA_FILE: [{}, {'status': STATUS_OPTIONS[0]}, {'week_assigned': 10}, {'category': LITERATURE_CATEGORIES[0]}, {'status': STATUS_OPTIONS[1], 'category': LITERATURE_CATEGORIES[1]}],
+    BOOKS_MAGAZINES_DATA_FILE: [{}, {'type': BOOK_MAGAZINE_TYPES[0]}, {'status': BOOK_STATUS_OPTIONS[1]}, {'type': BOOK_MAGAZINE_TYPES[1], 'status': BOOK_STATUS_OPTIONS[0]}],
+    MY_BLOG_POSTS_FILE: [{}, {'status': MY_BLOG_STATUS_OPTIONS[1]}, {'priority': MY_BLOG_PRIORITY_OPTIONS[0]}],
+    WEEKLY_PLAYLIST_FILE: [{}, {'status': PLAYLIST_STATUS_OPTIONS[0]}],
+    WEEKLY_EXERCISE_LOG_FILE: [{}, {'exercise_type': EXERCISE_TYPES[0]}, {'status': EXERCISE_LOG_STATUS_OPTIONS[1]}],
+}
+TAB_DISTINCT_FIELDS = {LITERATURE_DATA_FILE: ['week_assigned', 'category'], WEEKLY_PLAYLIST_FILE: ['year_week'], WEEKLY_EXERCISE_LOG_FILE: ['year_week']}
+STATS_COUNTS = {
+    LITERATURE_DATA_FILE: [('status', None), ('category', None)],
+    BOOKS_MAGAZINES_DATA_FILE: [('type', None), ('status', {'type': BOOK_MAGAZINE_TYPES[0]})],
+    MY_BLOG_POSTS_FILE: [('status', None), ('priority', None)],
+    WEEKLY_PLAYLIST_FILE: [('status', None), ('year_week', None)],
+    WEEKLY_EXERCISE_LOG_FILE: [('exercise_type', None), ('status', None), ('year_week', None)],
+}
+
+def run_tab_filters(data_list, data_file):
+    # 一次重跑中该 tab 的筛选: 下拉选项 + 每种筛选条件的首页 (含一次搜索)
+    for field in TAB_DISTINCT_FIELDS.get(data_file, []):
+        distinct_values(data_list, data_file, field)
+    for filters in TAB_FILTERS[data_file]:
+        query_page(data_list, data_file, filters, 1, 20)
+    query_page(data_list, data_file, {}, 1, 20, search="gene 模型")
+
+def run_stats_counts(data_list, data_file):
+    return [count_by(data_list, data_file, field, filters) for field, filters in STATS_COUNTS[data_file]]
+
+
+# --- 计时与记录 ---
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class BenchRecorder:
+    """收集结果并追加写入 JSONL 文件，同时打印与该文件中上一次相同测量项的对比。"""
+
+    def __init__(self, path):
+        self.path = path
+        self.run = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "commit": _git_commit(), "storage": STORAGE_MODE, "python": sys.version.split()[0]}
+        self.previous = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try: row = json.loads(line)
+                    except ValueError: continue
+                    self.previous[self._key(row)] = row
+
+    @staticmethod
+    def _key(row):
+        return (row.get("storage"), row.get("size"), row.get("collection"), row.get("op"))
+
+    def record(self, size, collection, op, samples):
+        row = dict(self.run, size=size, collection=collection, op=op, samples=[round(s, 6) for s in samples],
+                   median=round(statistics.median(samples), 6), min=round(min(samples), 6))
+        before = self.previous.get(self._key(row))
+        change = f"  ({row['median'] / before['median']:.2f}x 上次 {before.get('commit') or '?'})" if before and before.get('median') else ""
+        print(f"{size:>9,} {collection:<9} {op:<17} 中位 {row['median'] * 1000:10.2f} ms  最小 {row['min'] * 1000:10.2f} ms{change}", flush=True)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return row
+
+
+# --- 测量 ---
+def bench_collection(recorder, size, name, data_file, repeat=3, edits=20):
+    """在当前目录下为一个集合生成数据并测量各项操作。"""
+    entries = generate_entries(data_file, size)
+    recorder.record(size, name, "save", _timed(lambda: save_json_data(data_file, entries), repeat))
+    del entries
+
+    def cold_load():
+        forget_loaded(data_file)
+        return load_json_data(data_file, [])
+    recorder.record(size, name, "load", _timed(cold_load, repeat))
+    data_list = load_json_data(data_file, [])
+    recorder.record(size, name, "load_cached", _timed(lambda: load_json_data(data_file, []), repeat))
+    recorder.record(size, name, "get_next_id", _timed(lambda: get_next_id(data_list), repeat))
+
+    # 第一次筛选包含列式视图 / 检索索引的构建，单独记录
+    recorder.record(size, name, "filter_first", _timed(lambda: run_tab_filters(data_list, data_file), 1))
+    recorder.record(size, name, "filter", _timed(lambda: run_tab_filters(data_list, data_file), repeat))
+    recorder.record(size, name, "stats_counts", _timed(lambda: run_stats_counts(data_list, data_file), repeat))
+
+    # 修改: 逐条立即落盘 (与脚本外调用一致) 以及同一批次中合并落盘 (与应用中的一次重跑一致)
+    rng = random.Random(size)
+    field, values = 'status', {LITERATURE_DATA_FILE: STATUS_OPTIONS, BOOKS_MAGAZINES_DATA_FILE: BOOK_STATUS_OPTIONS, MY_BLOG_POSTS_FILE: MY_BLOG_STATUS_OPTIONS,
+                               WEEKLY_PLAYLIST_FILE: PLAYLIST_STATUS_OPTIONS, WEEKLY_EXERCISE_LOG_FILE: EXERCISE_LOG_STATUS_OPTIONS}[data_file]
+    recorder.record(size, name, "update", _timed(lambda: update_entry_field(data_list, rng.randrange(1, size + 1), field, rng.choice(values), data_file), repeat))
+
+    def batch_update():
+        begin_write_batch()
+        for _ in range(edits):
+            update_entry_field(data_list, rng.randrange(1, size + 1), field, rng.choice(values), data_file)
+        flush_write_batch()
+    recorder.record(size, name, f"update_batch{edits}", _timed(batch_update, repeat))
+    victims = iter(rng.sample(range(1, size + 1), repeat))
+    recorder.record(size, name, "delete", _timed(lambda: delete_entry_by_id(data_list, next(victims), data_file), repeat))
+    # 修改之后的首次筛选 (派生索引增量更新后的查询)
+    recorder.record(size, name, "filter_after_edit", _timed(lambda: run_tab_filters(data_list, data_file), 1))
+
+def bench_app(recorder, size, reruns=5):
+    """用 AppTest 无界面运行 literature.py: 首次运行 (冷加载五个集合) 以及之后的重跑和一次状态修改。"""
+    from streamlit.testing.v1 import AppTest
+    forget_loaded()
+    at = AppTest.from_file(APP_FILE, default_timeout=600)
+    started = time.perf_counter()
+    at.run()
+    recorder.record(size, "app", "first_run", [time.perf_counter() - started])
+    if at.exception:
+        print(f"AppTest 运行出错: {at.exception}", file=sys.stderr)
+        return
+    recorder.record(size, "app", "rerun", _timed(at.run, reruns))
+    selects = [s for s in at.selectbox if s.key and s.key.startswith("lit_status_select")]
+    if selects:
+        selects[0].set_value(STATUS_OPTIONS[-1] if selects[0].value != STATUS_OPTIONS[-1] else STATUS_OPTIONS[0])
+        recorder.record(size, "app", "edit_rerun", _timed(at.run, 1))
+
+def run_benchmarks(sizes, collections, results_file=BENCH_RESULTS_FILE, repeat=3, app_max_size=100_000, workdir=None):
+    recorder = BenchRecorder(os.path.abspath(results_file) if results_file else None)
+    cwd = os.getcwd()
+    for size in sizes:
+        # 每个规模使用单独的空目录；集合逐个测量，内存中同时只保留一个集合的合成数据
+        directory = tempfile.mkdtemp(prefix=f"readlist-bench-{size}-", dir=workdir)
+        os.chdir(directory)
+        reset_storage() # 后端、数据库连接和锁按相对路径缓存，换目录后重新打开
+        try:
+            for name in collections:
+                bench_collection(recorder, size, name, BENCH_COLLECTIONS[name], repeat)
+                forget_loaded(BENCH_COLLECTIONS[name])
+            if app_max_size and size <= app_max_size:
+                # 重跑测量需要五个集合都有数据；前面的删除只少了几条，直接补齐未测量的集合
+                benched = {BENCH_COLLECTIONS[name] for name in collections}
+                for data_file in DATA_FILES:
+                    if data_file not in benched:
+                        save_json_data(data_file, generate_entries(data_file, size))
+                forget_loaded()
+                bench_app(recorder, size)
+        finally:
+            reset_storage()
+            os.chdir(cwd)
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    parser = argparse.ArgumentParser(description="阅读列表数据操作的性能基准 (存储模式由 READLIST_STORAGE 决定)")
+    parser.add_argument("--sizes", type=lambda s: [int(v) for v in s.split(",")], default=BENCH_SIZES, help="逗号分隔的条目数 (默认 1000,10000,100000,1000000)")
+    parser.add_argument("--collections", nargs="+", choices=list(BENCH_COLLECTIONS), default=list(BENCH_COLLECTIONS))
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量重复次数，记录中位数和最小值")
+    parser.add_argument("--app-max-size", type=int, default=100_000, help="只在不超过该规模时运行 AppTest 重跑测量，0 表示不运行")
+    parser.add_argument("-o", "--output", default=BENCH_RESULTS_FILE, help="结果追加写入的 JSONL 文件")
+    parser.add_argument("--no-record", action="store_true", help="只打印，不写结果文件")
+    parser.add_argument("--workdir", help="生成数据的临时目录所在位置 (默认系统临时目录)")
+    args = parser.parse_args()
+    logging.getLogger("streamlit").setLevel(logging.ERROR) # 脚本外调用 st.success 等会产生大量无运行上下文的警告
+    run_benchmarks(args.sizes, args.collections, None if args.no_record else args.output, args.repeat, args.app_max_size, args.workdir)
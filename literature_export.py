@@ -0,0 +1,142 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+from literature_storage import (
+    LITERATURE_DATA_FILE, BOOKS_MAGAZINES_DATA_FILE, MY_BLOG_POSTS_FILE, WEEKLY_PLAYLIST_FILE, WEEKLY_EXERCISE_LOG_FILE,
+    load_json_data, query_entries, get_sql_backend,
+)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # 未安装 pyarrow 时只能导出 CSV / JSONL
+    pa = pq = None
+
+# --- 分块导出 (CSV / JSONL / Parquet) ---
+# 条目按 id 顺序每次取一块写出: sqlite 模式下逐块查询数据库，其他模式逐块切分内存列表，
+# 写出过程中只有当前块会被转换为行，内存占用与集合大小无关
+EXPORT_CHUNK_SIZE = int(os.environ.get("READLIST_EXPORT_CHUNK", "1000"))
+EXPORT_FORMATS = {"csv": ("text/csv", ".csv"), "jsonl": ("application/x-ndjson", ".jsonl"), "parquet": ("application/vnd.apache.parquet", ".parquet")}
+AVAILABLE_EXPORT_FORMATS = [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or pa is not None]
+EXPORT_COLLECTIONS = {"literature": LITERATURE_DATA_FILE, "books": BOOKS_MAGAZINES_DATA_FILE, "blog": MY_BLOG_POSTS_FILE, "playlist": WEEKLY_PLAYLIST_FILE, "exercise": WEEKLY_EXERCISE_LOG_FILE}
+
+# CSV / Parquet 的列及类型 (JSONL 原样输出整个条目)；"list" 列在 CSV 中以 "; " 连接
+EXPORT_COLUMNS = {
+    LITERATURE_DATA_FILE: {'id': 'int', 'title': 'str', 'authors': 'str', 'year': 'int', 'source': 'str', 'doi': 'str', 'week_assigned': 'int', 'status': 'str', 'categories': 'list', 'date_added': 'date', 'notes': 'str'},
+    BOOKS_MAGAZINES_DATA_FILE: {'id': 'int', 'title': 'str', 'type': 'str', 'author_publisher': 'str', 'status': 'str', 'progress': 'int', 'issue_volume': 'str', 'date_added': 'date', 'notes': 'str'},
+    MY_BLOG_POSTS_FILE: {'id': 'int', 'title': 'str', 'status': 'str', 'priority': 'str', 'due_date': 'date', 'publish_date': 'date', 'topic_keywords': 'str', 'outline_notes': 'str', 'link_published': 'str', 'date_added': 'date'},
+    WEEKLY_PLAYLIST_FILE: {'id': 'int', 'year_assigned': 'int', 'week_assigned': 'int', 'song_title': 'str', 'artist': 'str', 'album': 'str', 'status': 'str', 'notes': 'str', 'date_added': 'date'},
+    WEEKLY_EXERCISE_LOG_FILE: {'id': 'int', 'date': 'date', 'exercise_type': 'str', 'duration_intensity': 'str', 'status': 'str', 'notes': 'str', 'date_added': 'date'},
+}
+# 日期范围筛选所依据的字段
+EXPORT_DATE_FIELDS = {WEEKLY_EXERCISE_LOG_FILE: 'date'}
+
+
+def iter_chunks(data_list, data_file, filters=None, date_from=None, date_to=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """按 id 顺序逐块产出符合条件的条目列表；date_from / date_to 为 ISO 日期字符串 (含两端)。"""
+    backend = get_sql_backend(data_file, filters)
+    if backend is not None:
+        chunks = backend.iter_chunks(filters, chunk_size)
+    else:
+        entries = query_entries(data_list, data_file, filters)
+        if any(entries[i].get('id', 0) > entries[i + 1].get('id', 0) for i in range(len(entries) - 1)): # 通常已按 id 递增
+            entries = sorted(entries, key=lambda e: e.get('id', 0))
+        chunks = (entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size))
+    date_field = EXPORT_DATE_FIELDS.get(data_file, 'date_added')
+    for chunk in chunks:
+        if date_from or date_to: # ISO 日期字符串可以直接按字典序比较
+            chunk = [e for e in chunk if isinstance(e.get(date_field), str) and (not date_from or e[date_field] >= date_from) and (not date_to or e[date_field][:10] <= date_to)]
+        if chunk:
+            yield chunk
+
+def _coerce(value, kind):
+    if value is None or (value == "" and kind != 'str'):
+        return [] if kind == 'list' else None
+    try:
+        if kind == 'int': return int(value)
+        if kind == 'date': return datetime.date.fromisoformat(str(value)[:10])
+        if kind == 'list': return [str(v) for v in value] if isinstance(value, list) else [str(value)]
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+def _parquet_schema(columns):
+    types = {'int': pa.int64(), 'str': pa.string(), 'date': pa.date32(), 'list': pa.list_(pa.string())}
+    return pa.schema([(name, types[kind]) for name, kind in columns.items()])
+
+def export_collection(data_list, data_file, out, fmt, filters=None, date_from=None, date_to=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """把集合中符合条件的条目分块写入二进制流 out，返回写出的条目数。"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}，可选: {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and pa is None:
+        raise ValueError("导出 Parquet 需要安装 pyarrow (pip install pyarrow)")
+    columns = EXPORT_COLUMNS[data_file]
+    chunks = iter_chunks(data_list, data_file, filters, date_from, date_to, chunk_size)
+    written = 0
+    if fmt == "parquet":
+        schema = _parquet_schema(columns)
+        with pq.ParquetWriter(out, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pylist([{name: _coerce(e.get(name), kind) for name, kind in columns.items()} for e in chunk], schema=schema))
+                written += len(chunk)
+        return written
+    text = io.TextIOWrapper(out, encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") # CSV 带 BOM，Excel 才能正确识别中文
+    try:
+        if fmt == "csv":
+            writer = csv.writer(text)
+            writer.writerow(columns)
+        for chunk in chunks:
+            if fmt == "csv":
+                writer.writerows(["; ".join(_coerce(e.get(name), kind)) if kind == 'list' else e.get(name) for name, kind in columns.items()] for e in chunk)
+            else:
+                text.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in chunk))
+            written += len(chunk)
+    finally:
+        text.flush()
+        text.detach() # 不随包装对象一起关闭调用方的流
+    return written
+
+def export_to_tempfile(data_list, data_file, fmt, filters=None, date_from=None, date_to=None):
+    """
+    导出到临时文件并返回以二进制只读方式重新打开的文件对象 (BufferedReader，下载按钮可以直接读取)。
+    SpooledTemporaryFile 不是下载按钮接受的类型，所以这里写真正的临时文件。
+    """
+    with tempfile.NamedTemporaryFile(delete=False) as out:
+        try:
+            export_collection(data_list, data_file, out, fmt, filters, date_from, date_to)
+        except BaseException:
+            out.close()
+            os.remove(out.name)
+            raise
+    f = open(out.name, "rb")
+    try: os.remove(out.name) # POSIX 下已打开的文件删除后仍可读取，关闭时释放空间
+    except OSError: pass # Windows 不能删除已打开的文件，留给系统清理临时目录
+    return f
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="分块导出集合 (存储模式由 READLIST_STORAGE 决定)")
+    parser.add_argument("collection", choices=sorted(EXPORT_COLLECTIONS))
+    parser.add_argument("format", choices=sorted(EXPORT_FORMATS))
+    parser.add_argument("-o", "--output", help="输出文件 (默认写到标准输出)")
+    parser.add_argument("--week", type=int, help="按计划周筛选 (week_assigned)")
+    parser.add_argument("--status", help="按状态筛选")
+    parser.add_argument("--category", help="按文献分类筛选")
+    parser.add_argument("--from", dest="date_from", help="起始日期 YYYY-MM-DD (运动记录按 date，其他按 date_added)")
+    parser.add_argument("--to", dest="date_to", help="结束日期 YYYY-MM-DD (含)")
+    args = parser.parse_args()
+    data_file = EXPORT_COLLECTIONS[args.collection]
+    filters = {field: value for field, value in (('week_assigned', args.week), ('status', args.status), ('category', args.category)) if value is not None}
+    data_list = load_json_data(data_file, [])
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        count = export_collection(data_list, data_file, out, args.format, filters, args.date_from, args.date_to)
+    except ValueError as e:
+        sys.exit(f"导出失败: {e}")
+    finally:
+        if args.output: out.close()
+    print(f"已导出 {count} 条", file=sys.stderr)
@@ -0,0 +1,255 @@
+import csv
+import datetime
+import os
+import re
+import time
+import unicodedata
+from literature_storage import (
+    LITERATURE_DATA_FILE, STATUS_OPTIONS,
+    get_current_week, load_json_data, append_entries,
+)
+
+# --- 批量导入文献 (BibTeX / RIS / CSV) ---
+# 文件按行流式解析，不整体读入；按 DOI 和规范化标题去重 (包括与已有文献、文件内部的重复)，
+# 新条目连续分配一段 id 后一次写入，而不是每条都重写整个集合
+IMPORT_FORMATS = {".bib": "bibtex", ".bibtex": "bibtex", ".ris": "ris", ".csv": "csv"}
+
+# CSV 列名 (不区分大小写) -> 文献字段，兼容 Zotero / EndNote 导出以及本程序自己的字段名
+CSV_COLUMNS = {
+    'title': 'title', 'authors': 'authors', 'author': 'authors', 'year': 'year', 'publication year': 'year',
+    'source': 'source', 'publication title': 'source', 'journal': 'source', 'url': 'url', 'doi': 'doi',
+    'notes': 'notes', 'abstract note': 'notes', 'abstract': 'notes', 'categories': 'categories', 'week_assigned': 'week_assigned',
+}
+# RIS 标签 -> 文献字段 (同一字段出现多个标签时取第一个)
+RIS_TAGS = {
+    'TI': 'title', 'T1': 'title', 'AU': 'authors', 'A1': 'authors', 'PY': 'year', 'Y1': 'year', 'DA': 'year',
+    'JO': 'source', 'JF': 'source', 'T2': 'source', 'JA': 'source', 'PB': 'source', 'UR': 'url', 'DO': 'doi',
+    'AB': 'notes', 'N2': 'notes', 'N1': 'notes',
+}
+_RIS_LINE_RE = re.compile(r"^([A-Z][A-Z0-9])  -(?: (.*))?$")
+_BRACE_RE = re.compile(r"(?<!\\)[{}]")
+_BIB_FIELD_RE = re.compile(r"\s*([\w\-:.]+)\s*=\s*")
+_BIB_MONTHS = {m: str(i) for i, m in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+
+
+def detect_format(filename):
+    fmt = IMPORT_FORMATS.get(os.path.splitext(filename)[1].lower())
+    if fmt is None:
+        raise ValueError(f"无法根据文件名判断格式: {filename}，支持 {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+# --- BibTeX ---
+def _clean_latex(value):
+    value = re.sub(r"\\([&%$#_{}])", r"\1", value)
+    value = value.replace("{", "").replace("}", "").replace("~", " ")
+    return " ".join(value.split())
+
+def _bib_value(body, pos, macros):
+    # 解析从 pos 开始的一个字段值 (支持 {..}、".."、数字/宏以及 # 拼接)，返回 (值, 结束位置)
+    parts = []
+    while True:
+        while pos < len(body) and body[pos].isspace(): pos += 1
+        if pos >= len(body): break
+        if body[pos] in '{"':
+            closing, depth, start = body[pos], 0, pos + 1
+            pos += 1
+            while pos < len(body):
+                ch = body[pos]
+                if ch == '\\': pos += 2; continue
+                if ch == '{': depth += 1
+                elif ch == '}':
+                    if depth == 0 and closing == '{': break
+                    depth -= 1
+                elif ch == '"' and closing == '"' and depth == 0: break
+                pos += 1
+            parts.append(body[start:pos])
+            pos += 1
+        else:
+            match = re.match(r"[^,#\s]+", body[pos:])
+            token = match.group() if match else ""
+            parts.append(macros.get(token.lower(), _BIB_MONTHS.get(token.lower(), token)))
+            pos += len(token)
+        while pos < len(body) and body[pos].isspace(): pos += 1
+        if pos < len(body) and body[pos] == '#':
+            pos += 1
+            continue
+        break
+    return "".join(parts), pos
+
+def _parse_bib_entry(text, macros):
+    match = re.match(r"@\s*(\w+)\s*\{", text)
+    if not match:
+        return None
+    entry_type, body = match.group(1).lower(), text[match.end():text.rfind('}')]
+    if entry_type in ("comment", "preamble"):
+        return None
+    fields, pos = {}, 0
+    if entry_type != "string":
+        pos = body.find(',') + 1 if ',' in body else len(body) # 跳过引用键
+    while pos < len(body):
+        field = _BIB_FIELD_RE.match(body, pos)
+        if not field:
+            break
+        value, pos = _bib_value(body, field.end(), macros)
+        fields[field.group(1).lower()] = value
+        comma = body.find(',', pos)
+        pos = len(body) if comma < 0 else comma + 1
+    if entry_type == "string":
+        macros.update(fields)
+        return None
+    fields = {k: _clean_latex(v) for k, v in fields.items()}
+    authors = [a.strip() for a in re.split(r"\s+and\s+", fields.get('author', '')) if a.strip()]
+    # "姓, 名" 转为 "名 姓"，作者之间用逗号分隔 (与侧边栏输入一致)
+    authors = [" ".join(reversed([p.strip() for p in a.split(',', 1)])) if ',' in a else a for a in authors]
+    return {
+        'title': fields.get('title', ''), 'authors': ", ".join(authors), 'year': fields.get('year', ''),
+        'source': fields.get('journal') or fields.get('booktitle') or fields.get('publisher') or fields.get('howpublished', ''),
+        'url': fields.get('url', ''), 'doi': fields.get('doi', ''), 'notes': fields.get('abstract') or fields.get('note', ''),
+    }
+
+def parse_bibtex(stream):
+    """逐行读取 BibTeX，按花括号配对切出每个条目后解析，逐条产出文献字段字典。"""
+    macros, chunk, depth = {}, None, 0
+    for line in stream:
+        while line:
+            if chunk is None:
+                at = line.find('@')
+                if at < 0: break
+                line, chunk, depth = line[at:], [], 0
+            end = None
+            for brace in _BRACE_RE.finditer(line):
+                depth += 1 if brace.group() == '{' else -1
+                if depth == 0:
+                    end = brace.end()
+                    break
+            if end is None:
+                chunk.append(line)
+                break
+            chunk.append(line[:end])
+            entry = _parse_bib_entry("".join(chunk), macros)
+            if entry is not None:
+                yield entry
+            chunk, line = None, line[end:]
+
+# --- RIS ---
+def parse_ris(stream):
+    """逐行读取 RIS，遇到 ER 标签时产出一条文献字段字典。"""
+    record = {}
+    for line in stream:
+        match = _RIS_LINE_RE.match(line.rstrip("\r\n"))
+        if not match:
+            continue
+        tag, value = match.group(1), (match.group(2) or "").strip()
+        if tag == 'ER':
+            if record:
+                record['authors'] = ", ".join(record.get('authors', []))
+                yield record
+            record = {}
+        elif tag in RIS_TAGS and value:
+            field = RIS_TAGS[tag]
+            if field == 'authors':
+                name = [p.strip() for p in value.split(',', 1)]
+                record.setdefault('authors', []).append(" ".join(reversed(name)) if len(name) == 2 else value)
+            elif field == 'year':
+                year = re.search(r"\d{4}", value)
+                if year: record.setdefault('year', year.group())
+            else:
+                record.setdefault(field, value)
+    if record: # 文件末尾缺少 ER
+        record['authors'] = ", ".join(record.get('authors', []))
+        yield record
+
+# --- CSV ---
+def parse_csv(stream):
+    """逐行读取带表头的 CSV，列名按 CSV_COLUMNS 映射到文献字段。"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    fields = [CSV_COLUMNS.get(name.strip().lower()) for name in header]
+    for row in reader:
+        record = {}
+        for field, value in zip(fields, row):
+            if field and value.strip() and field not in record:
+                record[field] = value.strip()
+        if record:
+            yield record
+
+PARSERS = {"bibtex": parse_bibtex, "ris": parse_ris, "csv": parse_csv}
+
+
+# --- 去重与导入 ---
+def normalize_doi(doi):
+    doi = (doi or "").strip().lower()
+    return re.sub(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", "", doi)
+
+def normalize_title(title):
+    title = unicodedata.normalize("NFKC", str(title or "")).casefold()
+    return "".join(ch for ch in title if ch.isalnum())
+
+def _to_entry(record, week, categories):
+    try: year = int(str(record.get('year', '')).strip()[:4])
+    except ValueError: year = None
+    try: week_assigned = int(record['week_assigned']) if record.get('week_assigned') else week
+    except ValueError: week_assigned = week
+    record_categories = [c.strip() for c in re.split(r"[;,]", record.get('categories', '')) if c.strip()]
+    return {
+        "id": None, "title": record['title'], "authors": record.get('authors', ''),
+        "year": year, "source": record.get('source') or record.get('url', ''), "doi": record.get('doi', ''),
+        "week_assigned": week_assigned, "status": STATUS_OPTIONS[0], "categories": list(dict.fromkeys(list(categories) + record_categories)),
+        "date_added": datetime.date.today().isoformat(), "notes": record.get('notes', ''),
+    }
+
+def import_literature(stream, fmt, data_list, data_file=LITERATURE_DATA_FILE, week=None, categories=(), dry_run=False):
+    """
+    从文本流导入文献到 data_list，返回统计字典:
+    parsed 解析出的条目数, imported 新增数, duplicates 重复跳过数, invalid 缺少标题跳过数, seconds 耗时, first_id 首个新 id。
+    """
+    if fmt not in PARSERS:
+        raise ValueError(f"不支持的导入格式: {fmt}，可选: {', '.join(PARSERS)}")
+    started = time.perf_counter()
+    week = week or get_current_week()
+    seen_dois = {normalize_doi(e.get('doi')) for e in data_list if isinstance(e, dict)}
+    seen_titles = {normalize_title(e.get('title')) for e in data_list if isinstance(e, dict)}
+    seen_dois.discard(""); seen_titles.discard("")
+    report = {'parsed': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0, 'seconds': 0.0, 'first_id': None}
+    new_entries = []
+    for record in PARSERS[fmt](stream):
+        report['parsed'] += 1
+        title_key, doi_key = normalize_title(record.get('title')), normalize_doi(record.get('doi'))
+        if not title_key:
+            report['invalid'] += 1
+            continue
+        if title_key in seen_titles or (doi_key and doi_key in seen_dois):
+            report['duplicates'] += 1
+            continue
+        seen_titles.add(title_key)
+        if doi_key: seen_dois.add(doi_key)
+        new_entries.append(_to_entry(record, week, categories))
+    if new_entries and not dry_run:
+        report['first_id'] = append_entries(data_list, new_entries, data_file)
+    report['imported'] = len(new_entries)
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+def format_report(report, dry_run=False):
+    rate = report['parsed'] / report['seconds'] if report['seconds'] > 0 else float('inf')
+    action = "可导入" if dry_run else "已导入"
+    return (f"解析 {report['parsed']} 条，{action} {report['imported']} 条，重复 {report['duplicates']} 条，缺少标题 {report['invalid']} 条；"
+            f"耗时 {report['seconds']:.2f} 秒 ({rate:,.0f} 条/秒)")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="批量导入 BibTeX / RIS / CSV 文献到阅读列表 (存储模式由 READLIST_STORAGE 决定)")
+    parser.add_argument("files", nargs="+", help="要导入的文件，格式按扩展名判断")
+    parser.add_argument("--format", choices=sorted(PARSERS), help="指定格式，覆盖按扩展名的判断")
+    parser.add_argument("--week", type=int, help="计划阅读周 (默认当前周)")
+    parser.add_argument("--category", action="append", default=[], help="为导入的文献设置分类，可重复")
+    parser.add_argument("--dry-run", action="store_true", help="只解析和去重，不写入")
+    args = parser.parse_args()
+    literature_list = load_json_data(LITERATURE_DATA_FILE, [])
+    for path in args.files:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            report = import_literature(f, args.format or detect_format(path), literature_list, week=args.week, categories=args.category, dry_run=args.dry_run)
+        print(f"{path}: {format_report(report, args.dry_run)}")
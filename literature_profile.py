@@ -0,0 +1,119 @@
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+# --- 运行计时 (可选) ---
+# 设置 READLIST_PROFILE=1 后，literature.py 每次运行都会记录各阶段的耗时 (加载、侧边栏、各 tab 的筛选与渲染、统计图表)，
+# 在侧边栏显示并可导出为 JSONL 或 Chrome trace (chrome://tracing、Perfetto 可直接打开)。
+# 未开启时使用空实现，不产生任何计时开销
+PROFILE_ENABLED = os.environ.get("READLIST_PROFILE", "0").lower() not in ("", "0", "false", "no")
+PROFILE_LOG_FILE = os.environ.get("READLIST_PROFILE_LOG") # 非空时每次运行的 span 追加到该 JSONL 文件
+PROFILE_HISTORY = int(os.environ.get("READLIST_PROFILE_HISTORY", "20")) # 会话中保留、可导出的最近运行次数
+
+_log_lock = threading.Lock()
+
+
+class RunProfile:
+    """
+    一次脚本运行的计时记录。span 可以嵌套；phase 是顺序阶段，开始下一个阶段或 finish 时自动结束上一个，
+    这样 tab 等大段代码不需要整体缩进到 with 语句里。
+    """
+
+    def __init__(self, label=""):
+        self.label = label
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self.spans = [] # {"name", "cat", "start", "dur", "depth"}，start / dur 单位为秒，start 相对运行开始
+        self._stack = []
+        self._phase = None
+        self.total = None
+        self.interrupted = False
+
+    def _now(self):
+        return time.perf_counter() - self._origin
+
+    def begin(self, name, cat="app"):
+        span = {"name": name, "cat": cat, "start": self._now(), "dur": None, "depth": len(self._stack)}
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def end(self, span):
+        # 连同尚未结束的内层 span 一起结束
+        now = self._now()
+        while self._stack:
+            inner = self._stack.pop()
+            inner['dur'] = now - inner['start']
+            if inner is span: break
+
+    @contextlib.contextmanager
+    def span(self, name, cat="app"):
+        span = self.begin(name, cat)
+        try: yield span
+        finally: self.end(span)
+
+    def phase(self, name, cat="phase"):
+        if self._phase is not None and self._phase['dur'] is None:
+            self.end(self._phase)
+        self._phase = self.begin(name, cat) if name else None
+
+    def timed(self, name, fn, cat="build"):
+        """返回在 span 中调用 fn 的包装函数 (用于只在缓存未命中时才执行的构建函数)。"""
+        def wrapper(*args, **kwargs):
+            with self.span(name, cat): return fn(*args, **kwargs)
+        return wrapper
+
+    def finish(self, interrupted=False):
+        if self.total is None:
+            self.phase(None)
+            if self._stack: self.end(self._stack[0])
+            self.total, self.interrupted = self._now(), interrupted
+            if PROFILE_LOG_FILE:
+                with _log_lock, open(PROFILE_LOG_FILE, "a", encoding="utf-8") as f:
+                    f.write(to_jsonl([self]))
+        return self
+
+
+class NullProfile:
+    """未开启计时时的空实现。"""
+    def begin(self, name, cat="app"): return None
+    def end(self, span): pass
+    def span(self, name, cat="app"): return contextlib.nullcontext()
+    def phase(self, name, cat="phase"): pass
+    def timed(self, name, fn, cat="build"): return fn
+    def finish(self, interrupted=False): return self
+
+
+def start_profile(label=""):
+    return RunProfile(label) if PROFILE_ENABLED else NullProfile()
+
+
+# --- 导出 ---
+def to_jsonl(runs):
+    """每个 span 一行，时间单位为毫秒。"""
+    lines = []
+    for run in runs:
+        run_started = datetime.datetime.fromtimestamp(run.started).isoformat(timespec="milliseconds")
+        for span in run.spans:
+            lines.append(json.dumps({"run": run_started, "label": run.label, "interrupted": run.interrupted, "name": span['name'], "cat": span['cat'], "depth": span['depth'],
+                                     "start_ms": round(span['start'] * 1000, 3), "dur_ms": round((span['dur'] or 0) * 1000, 3)}, ensure_ascii=False))
+    return "".join(line + "\n" for line in lines)
+
+def to_chrome_trace(runs):
+    """Chrome Trace Event 格式 (完整事件 "X")，时间戳为微秒，多次运行按实际时间先后排列。"""
+    pid = os.getpid()
+    events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "literature.py"}}]
+    for run in runs:
+        for span in run.spans:
+            events.append({"name": span['name'], "cat": span['cat'], "ph": "X", "pid": pid, "tid": 0,
+                           "ts": round((run.started + span['start']) * 1e6, 1), "dur": round((span['dur'] or 0) * 1e6, 1),
+                           "args": {"run": run.label, "interrupted": run.interrupted}})
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, ensure_ascii=False)
+
+def summarize(run):
+    """按开始顺序返回 (缩进后的名称, 类别, 耗时毫秒, 占整次运行的比例) 列表。"""
+    total = run.total or 0
+    return [("　" * span['depth'] + span['name'], span['cat'], (span['dur'] or 0) * 1000, (span['dur'] or 0) / total if total else 0.0) for span in run.spans]
@@ -0,0 +1,1391 @@
+import streamlit as st
+import json
+import datetime
+import os
+import sqlite3
+import threading
+import time
+import atexit
+import shutil
+import tempfile
+import itertools
+import math
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+import pandas as pd
+try:
+    import fcntl
+except ImportError: # Windows 下没有 fcntl，只做进程内互斥
+    fcntl = None
+
+# --- 配置 ---
+LITERATURE_DATA_FILE = "reading_list.json"; BOOKS_MAGAZINES_DATA_FILE = "books_magazines_list.json"; MY_BLOG_POSTS_FILE = "my_blog_posts.json"; WEEKLY_PLAYLIST_FILE = "weekly_playlists.json"; WEEKLY_EXERCISE_LOG_FILE = "weekly_exercise_logs.json"
+DATA_FILES = [LITERATURE_DATA_FILE, BOOKS_MAGAZINES_DATA_FILE, MY_BLOG_POSTS_FILE, WEEKLY_PLAYLIST_FILE, WEEKLY_EXERCISE_LOG_FILE]
+STATUS_OPTIONS = ["待阅读", "阅读中", "已阅读"]; LITERATURE_CATEGORIES = ["生物", "医学", "计算机", "化学", "物理", "其他"]; BOOK_MAGAZINE_TYPES = ["书籍", "杂志"]; BOOK_STATUS_OPTIONS = ["想读", "在读", "已读"]; MY_BLOG_STATUS_OPTIONS = ["构思中", "草稿中", "待编辑", "待发布", "已发布", "搁置"]; MY_BLOG_PRIORITY_OPTIONS = ["高", "中", "低"]; PLAYLIST_STATUS_OPTIONS = ["想听", "在听", "已听过"]; EXERCISE_TYPES = ["跑步", "步行", "游泳", "自行车", "健身房(力量)", "健身房(有氧)", "瑜伽", "普拉提", "舞蹈", "球类运动", "其他"]; EXERCISE_LOG_STATUS_OPTIONS = ["计划中", "已完成", "部分完成", "未完成/跳过"]
+
+# 存储模式: "json" 每次修改都整体重写 JSON 文件;
+# "journal" 每次修改只向 <文件>.journal 追加一行操作日志 (JSONL)，加载时在快照上回放，累计到一定条数后压缩回快照;
+# "sqlite" 五个集合存放在同一个本地 SQLite 数据库中，筛选和统计走带索引的 SQL
+STORAGE_MODE = os.environ.get("READLIST_STORAGE", "json")
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("READLIST_JOURNAL_COMPACT", "500")) # 日志达到多少条操作后压缩为快照
+SQLITE_DB_FILE = os.environ.get("READLIST_SQLITE_DB", "readlist.db")
+WRITE_DEBOUNCE_SECONDS = float(os.environ.get("READLIST_WRITE_DEBOUNCE", "0")) # 写回批次中同一集合两次落盘的最小间隔，间隔内的修改合并为一次写入
+BACKUP_COUNT = int(os.environ.get("READLIST_BACKUPS", "3")) # JSON 文件保存时保留的历史版本数 (<文件>.bak.1 最新)，0 表示不保留
+CHART_CACHE_SIZE = int(os.environ.get("READLIST_CHART_CACHE", "32")) # 统计图表缓存最多保留的条目数 (最近最少使用的先淘汰)
+
+# sqlite 模式下每个集合单独建索引的字段 (id 为主键)。iso_week 由 date 派生
+SQLITE_INDEXED_FIELDS = {
+    LITERATURE_DATA_FILE: ['status', 'week_assigned'],
+    BOOKS_MAGAZINES_DATA_FILE: ['status', 'type'],
+    MY_BLOG_POSTS_FILE: ['status', 'priority'],
+    WEEKLY_PLAYLIST_FILE: ['status', 'week_assigned'],
+    WEEKLY_EXERCISE_LOG_FILE: ['status', 'exercise_type', 'date', 'iso_week'],
+}
+# 多值字段拆到单独的表中建索引: 集合 -> (条目中的列表字段, 筛选/统计时使用的字段名)
+SQLITE_MULTI_VALUED_FIELDS = {LITERATURE_DATA_FILE: ('categories', 'category')}
+# 全文检索的字段及权重 (词频乘以权重后参与打分)
+SEARCH_FIELDS = {
+    LITERATURE_DATA_FILE: {'title': 3, 'authors': 2, 'source': 1, 'notes': 1},
+    BOOKS_MAGAZINES_DATA_FILE: {'title': 3, 'author_publisher': 2, 'issue_volume': 1, 'notes': 1},
+    MY_BLOG_POSTS_FILE: {'title': 3, 'topic_keywords': 2, 'outline_notes': 1},
+    WEEKLY_PLAYLIST_FILE: {'song_title': 3, 'artist': 2, 'album': 2, 'notes': 1},
+    WEEKLY_EXERCISE_LOG_FILE: {'exercise_type': 2, 'duration_intensity': 1, 'notes': 1},
+}
+# 内存列式视图中各字段的类型 (字段同上面的索引字段)，其余字段为普通 object 列
+COLUMN_DTYPES = {'status': 'category', 'type': 'category', 'priority': 'category', 'exercise_type': 'category', 'category': 'category', 'week_assigned': 'Int64', 'iso_week': 'Int64', 'date': 'datetime64[ns]'}
+
+# --- 通用辅助函数 ---
+def get_current_week(): return datetime.date.today().isocalendar()[1]
+
+def _stat_signature(*paths):
+    # 以 (修改时间, 大小) 标识文件当前内容；文件不存在时为 None
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+# --- 条目集合 ---
+class EntryList(list):
+    """
+    带 id 索引的条目列表: 按 id 定位、删除以及分配下一个 id 都是常数时间 (删除后的索引修正按需分摊)。
+    其余行为与普通 list 完全相同，可以直接迭代、切片、json.dump 或传给 pandas。
+    next_id 单调递增并随数据一起保存，删除末尾条目后也不会复用旧 id。
+    """
+
+    _tokens = itertools.count(1)
+
+    def __init__(self, entries=(), next_id=None, version=0):
+        super().__init__(entries)
+        self._next_id = next_id or 1
+        self.version = version # 加载时磁盘上的集合版本号，用于写入时检测其他会话/进程的修改
+        self.token = next(self._tokens) # 每次加载得到的列表各不相同，配合 revision 标识内存中的内容
+        self.revision = 0 # 内存中的修改次数，任何增删改都会递增
+        self.indexes = {} # 派生索引 (列式视图、全文检索、周索引等): 类 -> 实例，首次使用时构建，之后随增删改增量更新
+        self._rebuild_index()
+
+    @property
+    def next_id(self):
+        if self._positions is None:
+            self._rebuild_index()
+        return self._next_id
+
+    def _rebuild_index(self):
+        self._positions = {}
+        for idx, entry in enumerate(self):
+            if isinstance(entry, dict):
+                self._positions[entry.get('id')] = idx
+                self._bump_next_id(entry)
+        self._stale_from = len(self)
+
+    def _bump_next_id(self, entry):
+        entry_id = entry.get('id')
+        if isinstance(entry_id, int) and entry_id >= self._next_id:
+            self._next_id = entry_id + 1
+
+    def position(self, entry_id):
+        if self._positions is None:
+            self._rebuild_index()
+        idx = self._positions.get(entry_id)
+        if idx is not None and idx >= self._stale_from:
+            # 之前的删除让这之后的位置整体前移了，从最早的删除点开始重新编号一次
+            for i in range(self._stale_from, len(self)):
+                if isinstance(self[i], dict):
+                    self._positions[self[i].get('id')] = i
+            self._stale_from = len(self)
+            idx = self._positions.get(entry_id)
+        return idx
+
+    def get_by_id(self, entry_id):
+        idx = self.position(entry_id)
+        return None if idx is None else self[idx]
+
+    def remove_by_id(self, entry_id):
+        idx = self.position(entry_id)
+        if idx is None:
+            return None
+        self.revision += 1
+        entry = self[idx]
+        super().__delitem__(idx)
+        del self._positions[entry_id]
+        self._stale_from = min(self._stale_from, idx)
+        return entry
+
+    def append(self, entry):
+        super().append(entry)
+        self.revision += 1
+        if isinstance(entry, dict):
+            self._bump_next_id(entry)
+            if self._positions is not None:
+                self._positions[entry.get('id')] = len(self) - 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def __iadd__(self, entries):
+        self.extend(entries)
+        return self
+
+    # 其他会打乱位置的修改: 丢弃索引和列式视图，下次使用时整体重建
+    def _invalidate(self): self._positions = None; self.indexes = {}; self.revision += 1
+
+    def __setitem__(self, key, value): super().__setitem__(key, value); self._invalidate()
+
+    def __delitem__(self, key): super().__delitem__(key); self._invalidate()
+
+    def insert(self, index, entry): super().insert(index, entry); self._invalidate()
+
+    def pop(self, index=-1): entry = super().pop(index); self._invalidate(); return entry
+
+    def remove(self, entry): super().remove(entry); self._invalidate()
+
+    def clear(self): super().clear(); self._invalidate()
+
+    def sort(self, *args, **kwargs): super().sort(*args, **kwargs); self._invalidate()
+
+    def reverse(self): super().reverse(); self._invalidate()
+
+
+def _unwrap(raw):
+    # 文件格式为 {"schema_version": ..., "next_id": ..., "entries": [...]}；旧版本直接保存为列表，同样可以读取 (视为结构版本 0)
+    if isinstance(raw, dict) and isinstance(raw.get('entries'), list):
+        return raw['entries'], {key: value for key, value in raw.items() if key != 'entries'}
+    return raw, {}
+
+def _envelope(data, schema_version):
+    return {"schema_version": schema_version, "next_id": get_next_id(data), "entries": data}
+
+def _read_json_file(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data, meta = _unwrap(json.load(f))
+    if not isinstance(data, list):
+        raise ValueError(f"文件 {filepath} 格式错误，应为JSON列表。")
+    return data, meta
+
+def _fsync_dir(dirpath):
+    # rename 本身需要目录项落盘才算持久化；Windows 不支持对目录 fsync
+    if os.name != 'posix':
+        return
+    fd = os.open(dirpath, os.O_RDONLY)
+    try: os.fsync(fd)
+    finally: os.close(fd)
+
+def _rotate_backups(filepath, count):
+    # <文件>.bak.1 为最新备份。用硬链接保留旧版本，这样替换主文件时始终不存在"文件缺失"的窗口
+    if count <= 0 or not os.path.exists(filepath):
+        return
+    for n in range(count - 1, 0, -1):
+        if os.path.exists(f"{filepath}.bak.{n}"):
+            os.replace(f"{filepath}.bak.{n}", f"{filepath}.bak.{n + 1}")
+    newest = f"{filepath}.bak.1"
+    if os.path.exists(newest):
+        os.remove(newest)
+    try: os.link(filepath, newest)
+    except OSError: shutil.copy2(filepath, newest)
+
+_UMASK = os.umask(0); os.umask(_UMASK)
+
+def _atomic_write_json(filepath, obj):
+    """写入同目录下的临时文件并 fsync，再 rename 覆盖目标文件；中途崩溃只会留下旧文件和一个临时文件。"""
+    dirpath = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(dir=dirpath, prefix=os.path.basename(filepath) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp 创建的文件权限为 0600，改为与原文件 (或普通新建文件) 一致
+        os.chmod(tmp_path, os.stat(filepath).st_mode & 0o777 if os.path.exists(filepath) else 0o666 & ~_UMASK)
+        _rotate_backups(filepath, BACKUP_COUNT)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(dirpath)
+
+
+# --- 并发控制 ---
+class CollectionLock:
+    """
+    集合级互斥锁: 进程内用 RLock，跨进程用锁文件上的 flock (建议锁)，可重入。
+    锁文件的内容就是该集合的版本号，每次写入前加一，持锁时才能读写。
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    @classmethod
+    def for_path(cls, path):
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            os.close(self._fd) # 关闭文件描述符即释放 flock
+            self._fd = None
+        self._rlock.release()
+
+    def read_version(self):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        raw = os.read(self._fd, 32).strip()
+        try: return int(raw) if raw else 0
+        except ValueError: return 0
+
+    def write_version(self, version):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, str(version).encode('ascii'))
+        os.fsync(self._fd)
+
+
+def _rebase_ops(fresh, ops):
+    """
+    把本会话的一批操作重新应用到磁盘上的最新数据 fresh 上 (原地修改)，返回 (可以写入的操作, 冲突说明)。
+    set 操作带有修改前的值 base，只有该字段在磁盘上仍是 base (或已经是新值) 时才写入 (compare-and-swap)，
+    否则保留其他会话的值并报告冲突；新增条目的 id 若已被占用则重新分配。
+    """
+    rebased, conflicts, renamed = [], [], {}
+    for op in ops:
+        if op['op'] == 'add':
+            entry = op['entry']
+            if fresh.position(entry.get('id')) is not None:
+                renamed[entry['id']] = entry['id'] = fresh.next_id
+            fresh.append(entry)
+            rebased.append(op)
+        elif op['op'] == 'set':
+            entry_id = renamed.get(op['id'], op['id'])
+            entry = fresh.get_by_id(entry_id)
+            if entry is None:
+                conflicts.append(f"ID 为 {entry_id} 的条目已被其他会话删除，对 {op['field']} 的修改未保存。")
+                continue
+            current = entry.get(op['field'])
+            if 'base' in op and current != op['base'] and current != op['value']:
+                conflicts.append(f"ID 为 {entry_id} 的条目的 {op['field']} 已被其他会话改为 {current!r}，本次修改 ({op['value']!r}) 未保存。")
+                continue
+            entry[op['field']] = op['value']
+            rebased.append({**op, 'id': entry_id})
+        elif op['op'] == 'del':
+            entry_id = renamed.get(op['id'], op['id'])
+            if fresh.remove_by_id(entry_id) is not None:
+                rebased.append({**op, 'id': entry_id})
+    return rebased, conflicts
+
+
+# --- 存储后端 ---
+# 修改统一表示为操作: {"op": "add", "entry": ...} / {"op": "set", "id": ..., "field": ..., "value": ...} / {"op": "del", "id": ...}
+# 后端的 apply(data, ops) 一次性落盘一批操作，data 为已经应用了这些操作的内存列表
+class JsonBackend:
+    """整文件读写: 任何修改都把整个列表重新写入 JSON 文件。load 返回 (条目列表, 元数据)。"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.collection_lock = CollectionLock.for_path(filepath + ".lock")
+
+    def signature(self): return _stat_signature(self.filepath)
+
+    def load(self):
+        try:
+            return _read_json_file(self.filepath)
+        except ValueError: # 包括 JSONDecodeError / UnicodeDecodeError
+            # 文件损坏: 先把它移到一边，避免之后保存空列表时覆盖掉，再从最新的有效备份恢复
+            corrupt_path = f"{self.filepath}.corrupt-{datetime.datetime.now():%Y%m%d%H%M%S%f}"
+            os.replace(self.filepath, corrupt_path)
+            n = 1
+            while os.path.exists(f"{self.filepath}.bak.{n}"):
+                backup = f"{self.filepath}.bak.{n}"
+                try:
+                    data, meta = _read_json_file(backup)
+                except ValueError:
+                    n += 1
+                    continue
+                _atomic_write_json(self.filepath, {**meta, "entries": data})
+                st.warning(f"文件 {self.filepath} 已损坏 (已另存为 {corrupt_path})，已从备份 {backup} 恢复。")
+                return data, meta
+            raise
+
+    def save_all(self, data):
+        _atomic_write_json(self.filepath, _envelope(data, SCHEMA_VERSIONS.get(self.filepath, 0)))
+
+    def apply(self, data, ops): self.save_all(data)
+
+
+class JournalBackend(JsonBackend):
+    """
+    追加式操作日志: JSON 文件作为快照，修改以 {"op": ...} 的形式逐行追加到 <文件>.journal。
+    回放是幂等的，因此压缩时即使在写快照和清空日志之间崩溃，也不会产生重复条目。
+    """
+
+    def __init__(self, filepath):
+        super().__init__(filepath)
+        self.journal_path = filepath + ".journal"
+        self.pending_ops = 0
+
+    def signature(self): return _stat_signature(self.filepath, self.journal_path)
+
+    def load(self):
+        data, meta = super().load()
+        if not os.path.exists(self.journal_path):
+            self.pending_ops = 0
+            return data, meta
+        ops, valid_end, offset = [], 0, 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"): break # 没有换行的最后一行是崩溃时没写完的操作，调用方没有收到成功
+                try: ops.append(json.loads(line))
+                except ValueError: continue
+                valid_end = offset
+        if offset > valid_end:
+            # 截掉写了一半的尾部，否则下一次追加会接在这一行后面，和它一起变成无法解析的一行而丢失
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_end)
+                f.flush()
+                os.fsync(f.fileno())
+        self.pending_ops = len(ops)
+        max_added_id = _replay_journal(data, ops)
+        if max_added_id is not None:
+            # 日志中新增后又删除的条目不在列表里了，但其 id 仍然不能被再次分配
+            meta['next_id'] = max(meta.get('next_id') or 1, max_added_id + 1)
+        return data, meta
+
+    def save_all(self, data):
+        # 整体保存即压缩: 写入新快照后清空日志
+        super().save_all(data)
+        if os.path.exists(self.journal_path):
+            open(self.journal_path, 'w', encoding='utf-8').close()
+        self.pending_ops = 0
+
+    def apply(self, data, ops):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending_ops += len(ops)
+        if self.pending_ops >= JOURNAL_COMPACT_THRESHOLD:
+            self.save_all(data)
+
+
+def _replay_journal(data, ops):
+    index = {entry.get('id'): idx for idx, entry in enumerate(data) if isinstance(entry, dict)}
+    deleted = set()
+    max_added_id = None
+    for op in ops:
+        kind = op.get('op')
+        if kind == 'add':
+            entry = op.get('entry', {})
+            if isinstance(entry.get('id'), int):
+                max_added_id = max(max_added_id or 0, entry['id'])
+            idx = index.get(entry.get('id'))
+            if idx is None:
+                index[entry.get('id')] = len(data)
+                data.append(entry)
+            else:
+                data[idx] = entry
+        elif kind == 'set':
+            idx = index.get(op.get('id'))
+            if idx is not None:
+                data[idx][op['field']] = op.get('value')
+        elif kind == 'del':
+            idx = index.pop(op.get('id'), None)
+            if idx is not None:
+                deleted.add(idx)
+    if deleted:
+        data[:] = [entry for idx, entry in enumerate(data) if idx not in deleted]
+    return max_added_id
+
+
+class SqliteBackend:
+    """
+    SQLite 存储: 每个集合一张表，条目原样存为 JSON 文本，另将常用筛选字段冗余成带索引的列。
+    首次打开某个集合时，如果对应的 JSON 文件存在，会一次性把其中的数据迁移进数据库。
+    """
+    _connections = {}
+    _connections_lock = threading.Lock()
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.table = os.path.splitext(os.path.basename(filepath))[0]
+        self.fields = SQLITE_INDEXED_FIELDS.get(filepath, ['status'])
+        self.multi_valued = SQLITE_MULTI_VALUED_FIELDS.get(filepath)
+        self.conn, self.lock = self._connect(SQLITE_DB_FILE)
+        self.collection_lock = CollectionLock.for_path(f"{SQLITE_DB_FILE}.{self.table}.lock")
+        with self.lock:
+            self._ensure_schema()
+        with self.collection_lock:
+            self._migrate_from_json()
+
+    @classmethod
+    def _connect(cls, db_file):
+        # Streamlit 每个会话在不同线程中运行脚本，因此同一数据库共享一个连接并串行化访问
+        with cls._connections_lock:
+            if db_file not in cls._connections:
+                conn = sqlite3.connect(db_file, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS readlist_meta (key TEXT PRIMARY KEY, value TEXT)")
+                cls._connections[db_file] = (conn, threading.RLock())
+            return cls._connections[db_file]
+
+    def _ensure_schema(self):
+        columns = "".join(f", {field}" for field in self.fields)
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY{columns}, data TEXT NOT NULL)")
+            for field in self.fields:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{field} ON {self.table} ({field})")
+            if self.multi_valued:
+                _, name = self.multi_valued
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table}_{name} (entry_id INTEGER NOT NULL, {name})")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{name} ON {self.table}_{name} ({name}, entry_id)")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{name}_entry ON {self.table}_{name} (entry_id)")
+
+    def _migrate_from_json(self):
+        meta_key = f"migrated:{self.table}"
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM readlist_meta WHERE key = ?", (meta_key,)).fetchone():
+                return
+            data, meta = [], {}
+            if os.path.exists(self.filepath):
+                # 用 JournalBackend 读取，这样之前 journal 模式下尚未压缩的操作日志也会一并迁移
+                data, meta = JournalBackend(self.filepath).load()
+                if not isinstance(data, list):
+                    raise ValueError(f"文件 {self.filepath} 格式错误，应为JSON列表，无法迁移到 SQLite。")
+                migrate_entries(self.filepath, data, meta.get('schema_version'))
+            with self.conn:
+                self._write_all(EntryList(data, meta.get('next_id')))
+                self.conn.execute("INSERT INTO readlist_meta (key, value) VALUES (?, ?)", (meta_key, datetime.datetime.now().isoformat()))
+
+    def _upsert(self, entry):
+        values = [entry.get('id')] + [_field_value(entry, field) for field in self.fields] + [json.dumps(entry, ensure_ascii=False)]
+        placeholders = ", ".join("?" for _ in values)
+        cursor = self.conn.execute(f"INSERT OR REPLACE INTO {self.table} (id, {''.join(f'{field}, ' for field in self.fields)}data) VALUES ({placeholders})", values)
+        if self.multi_valued:
+            source, name = self.multi_valued
+            entry_id = cursor.lastrowid if entry.get('id') is None else entry['id']
+            self.conn.execute(f"DELETE FROM {self.table}_{name} WHERE entry_id = ?", (entry_id,))
+            self.conn.executemany(f"INSERT INTO {self.table}_{name} (entry_id, {name}) VALUES (?, ?)", [(entry_id, value) for value in entry.get(source) or []])
+
+    def _write_all(self, data):
+        self.conn.execute(f"DELETE FROM {self.table}")
+        if self.multi_valued:
+            self.conn.execute(f"DELETE FROM {self.table}_{self.multi_valued[1]}")
+        for entry in data:
+            if isinstance(entry, dict):
+                self._upsert(entry)
+        self._save_next_id(data)
+
+    def _save_next_id(self, data):
+        self.conn.executemany("INSERT OR REPLACE INTO readlist_meta (key, value) VALUES (?, ?)", [
+            (f"next_id:{self.table}", str(get_next_id(data))), (f"schema_version:{self.table}", str(SCHEMA_VERSIONS.get(self.filepath, 0)))])
+
+    def signature(self):
+        # 本模块对该集合的每次写入都会递增其锁文件中的版本号，其他表的写入不会让这张表的缓存失效；
+        # 其他连接 (外部工具等) 直接改库时 data_version 会变化
+        with self.lock:
+            data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return _stat_signature(self.collection_lock.path) + (data_version,)
+
+    def load(self):
+        with self.lock:
+            rows = self.conn.execute(f"SELECT data FROM {self.table} ORDER BY id").fetchall()
+            meta = dict(self.conn.execute("SELECT key, value FROM readlist_meta WHERE key IN (?, ?)", (f"next_id:{self.table}", f"schema_version:{self.table}")).fetchall())
+        return [json.loads(row[0]) for row in rows], {key.split(':')[0]: int(value) for key, value in meta.items()}
+
+    def save_all(self, data):
+        with self.lock, self.conn:
+            self._write_all(data)
+
+    def apply(self, data, ops):
+        # 一批操作在同一个事务中提交
+        with self.lock, self.conn:
+            for op in ops:
+                if op['op'] == 'add':
+                    self._upsert(op['entry'])
+                elif op['op'] == 'set':
+                    row = self.conn.execute(f"SELECT data FROM {self.table} WHERE id = ?", (op['id'],)).fetchone()
+                    if row is not None:
+                        entry = json.loads(row[0])
+                        entry[op['field']] = op['value']
+                        self._upsert(entry)
+                elif op['op'] == 'del':
+                    self.conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (op['id'],))
+                    if self.multi_valued:
+                        self.conn.execute(f"DELETE FROM {self.table}_{self.multi_valued[1]} WHERE entry_id = ?", (op['id'],))
+            if any(op['op'] == 'add' for op in ops):
+                self._save_next_id(data)
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for field, value in (filters or {}).items():
+            if self.multi_valued and field == self.multi_valued[1]:
+                clauses.append(f"id IN (SELECT entry_id FROM {self.table}_{field} WHERE {field} = ?)")
+            elif field in self.fields:
+                clauses.append(f"{field} = ?")
+            else:
+                clauses.append(f"json_extract(data, '$.{field}') = ?")
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, filters, offset=0, limit=None, descending=False):
+        where, params = self._where(filters)
+        order = "DESC" if descending else "ASC"
+        with self.lock:
+            rows = self.conn.execute(f"SELECT data FROM {self.table}{where} ORDER BY id {order} LIMIT ? OFFSET ?", params + [-1 if limit is None else limit, offset]).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_chunks(self, filters, chunk_size):
+        # 按 id 分段读取 (WHERE id > 上一段最大 id)，每次只有一段条目在内存中
+        where, params = self._where(filters)
+        last_id = None
+        while True:
+            clause = where if last_id is None else (f"{where} AND id > ?" if where else " WHERE id > ?")
+            with self.lock:
+                rows = self.conn.execute(f"SELECT id, data FROM {self.table}{clause} ORDER BY id LIMIT ?", params + ([] if last_id is None else [last_id]) + [chunk_size]).fetchall()
+            if not rows:
+                return
+            yield [json.loads(row[1]) for row in rows]
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][0]
+
+    def count(self, filters):
+        where, params = self._where(filters)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}{where}", params).fetchone()[0]
+
+    def _column(self, field):
+        if self.multi_valued and field == self.multi_valued[1]:
+            return f"{self.table}_{field}", field, f" JOIN {self.table} ON {self.table}.id = {self.table}_{field}.entry_id"
+        if field in self.fields:
+            return self.table, field, ""
+        return self.table, f"json_extract(data, '$.{field}')", ""
+
+    def distinct_values(self, field):
+        table, column, join = self._column(field)
+        with self.lock:
+            rows = self.conn.execute(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY {column}").fetchall()
+        return [row[0] for row in rows]
+
+    def count_by(self, field, filters=None):
+        table, column, join = self._column(field)
+        where, params = self._where(filters)
+        not_null = f"{column} IS NOT NULL"
+        where = f"{where} AND {not_null}" if where else f" WHERE {not_null}"
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {column}, COUNT(*) AS n FROM {table}{join}{where} GROUP BY {column} ORDER BY n DESC", params).fetchall()
+        return dict(rows)
+
+
+BACKEND_CLASSES = {"json": JsonBackend, "journal": JournalBackend, "sqlite": SqliteBackend}
+_backends = {}
+
+def get_backend(filepath):
+    key = (STORAGE_MODE, filepath)
+    if key not in _backends:
+        if STORAGE_MODE not in BACKEND_CLASSES:
+            raise ValueError(f"未知的存储模式: {STORAGE_MODE}，可选: {', '.join(BACKEND_CLASSES)}")
+        _backends[key] = BACKEND_CLASSES[STORAGE_MODE](filepath)
+    return _backends[key]
+
+
+# --- 数据读写 ---
+# 已加载数据的缓存: 文件路径 -> (存储签名, 列表)。
+# Streamlit 每次重跑都会重新加载五个集合，签名未变时直接复用上次的列表，不再解析文件；
+# 通过本模块写入后会立即用写入后的签名刷新缓存，外部修改则会因签名变化而重新加载
+_load_cache = {}
+
+def _remember_loaded(filepath, data):
+    _load_cache[filepath] = (get_backend(filepath).signature(), data)
+
+def forget_loaded(filepath=None):
+    """丢弃已加载数据的缓存 (filepath 为 None 时丢弃全部)，下次 load_json_data 会重新读取存储。"""
+    if filepath is None: _load_cache.clear()
+    else: _load_cache.pop(filepath, None)
+
+def reset_storage():
+    """
+    写出缓冲的修改，关闭数据库连接并清空后端、集合锁和已加载数据的缓存。
+    这些缓存以相对路径为键，切换工作目录后需要先调用，否则仍会使用原目录的数据库和锁文件。
+    """
+    _write_behind.flush(force=True)
+    forget_loaded()
+    _backends.clear()
+    with SqliteBackend._connections_lock:
+        for conn, lock in SqliteBackend._connections.values():
+            with lock: conn.close()
+        SqliteBackend._connections.clear()
+    with CollectionLock._instances_lock:
+        CollectionLock._instances.clear()
+
+def _fill_defaults(defaults):
+    # 迁移: 为缺少字段的条目补上默认值 (值为函数时每个条目调用一次)；缺少 id 时按位置编号
+    def migrate(entries):
+        for i, entry in enumerate(entries):
+            entry.setdefault('id', i + 1)
+            for field, default in defaults.items():
+                if field not in entry:
+                    entry[field] = default() if callable(default) else default
+    return migrate
+
+def _today(): return datetime.date.today().isoformat()
+
+def _add_playlist_year(entries):
+    # 歌单条目记录计划收听的 ISO 年，旧条目取添加日期所在的 ISO 年
+    for entry in entries:
+        if 'year_assigned' not in entry:
+            try: entry['year_assigned'] = datetime.date.fromisoformat(entry.get('date_added')).isocalendar()[0]
+            except (TypeError, ValueError): entry['year_assigned'] = datetime.date.today().isocalendar()[0]
+
+# 每个集合的结构迁移，第 n 个函数把数据从版本 n-1 升级到版本 n。
+# 文件 (或 SQLite 元数据) 中记录了 schema_version，加载时只运行尚未执行过的迁移并立即写回，
+# 之后的正常加载不再逐条补全字段；默认的添加日期等也只在迁移时确定一次，不会每天变化
+SCHEMA_MIGRATIONS = {
+    LITERATURE_DATA_FILE: [
+        _fill_defaults({'title': "未命名文献", 'status': STATUS_OPTIONS[0], 'notes': "", 'categories': list, 'week_assigned': get_current_week, 'date_added': _today}),
+    ],
+    BOOKS_MAGAZINES_DATA_FILE: [
+        _fill_defaults({'title': "未命名条目", 'type': BOOK_MAGAZINE_TYPES[0], 'status': BOOK_STATUS_OPTIONS[0], 'progress': 0, 'issue_volume': "", 'date_added': _today}),
+    ],
+    MY_BLOG_POSTS_FILE: [
+        _fill_defaults({'title': "未命名文章", 'status': MY_BLOG_STATUS_OPTIONS[0], 'due_date': None, 'publish_date': None, 'priority': MY_BLOG_PRIORITY_OPTIONS[1],
+                        'topic_keywords': "", 'outline_notes': "", 'link_published': "", 'date_added': _today}),
+    ],
+    WEEKLY_PLAYLIST_FILE: [
+        _fill_defaults({'week_assigned': get_current_week, 'song_title': "未命名歌曲", 'artist': "", 'album': "", 'status': PLAYLIST_STATUS_OPTIONS[0], 'notes': "", 'date_added': _today}),
+        _add_playlist_year,
+    ],
+    WEEKLY_EXERCISE_LOG_FILE: [
+        _fill_defaults({'date': _today, 'exercise_type': EXERCISE_TYPES[0], 'duration_intensity': "", 'status': EXERCISE_LOG_STATUS_OPTIONS[0], 'notes': "", 'date_added': _today}),
+    ],
+}
+SCHEMA_VERSIONS = {filepath: len(migrations) for filepath, migrations in SCHEMA_MIGRATIONS.items()}
+
+def migrate_entries(filepath, data, from_version):
+    """在内存中把 data 从 from_version 升级到当前结构版本，返回是否做了修改。"""
+    migrations = SCHEMA_MIGRATIONS.get(filepath, [])[from_version or 0:]
+    for migration in migrations:
+        migration(data)
+    return bool(migrations)
+
+def load_json_data(filepath, default_data_structure=None):
+    if default_data_structure is None:
+        default_data_structure = []
+    backend = get_backend(filepath)
+    if isinstance(backend, JsonBackend) and not os.path.exists(filepath):
+        # 如果文件不存在，创建一个空的JSON文件 (journal 模式下已有的操作日志仍会被回放)
+        _atomic_write_json(filepath, default_data_structure)
+    signature = backend.signature()
+    cached = _load_cache.get(filepath)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    version = 0
+    try:
+        # 持锁读取，保证版本号与数据对应同一次写入
+        with backend.collection_lock as lock:
+            version = lock.read_version()
+            data, meta = backend.load() # 内容不是列表的文件与损坏文件一样处理 (见 _read_json_file)
+            data = EntryList(data, meta.get('next_id'), version)
+            if migrate_entries(filepath, data, meta.get('schema_version')):
+                # 旧版本数据: 迁移结果立即写回并记录新的结构版本，之后的加载不再需要迁移
+                data.version = version = version + 1
+                lock.write_version(version)
+                backend.save_all(data)
+                signature = backend.signature()
+        _load_cache[filepath] = (signature, data)
+        return data
+    except (ValueError, FileNotFoundError): # 损坏且没有可用备份，原文件已另存为 .corrupt-*
+        st.error(f"加载文件 {filepath} 失败或文件内容非标准JSON。将使用默认空列表。")
+        # 带上当前的锁版本，之后的写入不会因版本不一致而去重新加载已被移走的文件
+        return EntryList(default_data_structure, None, version)
+
+def save_json_data(filepath, data):
+    # 整体保存是有意的覆盖，不与其他会话的修改合并
+    _write_behind.discard(filepath, data)
+    backend = get_backend(filepath)
+    with backend.collection_lock as lock:
+        version = lock.read_version() + 1
+        lock.write_version(version)
+        backend.save_all(data)
+    if isinstance(data, EntryList):
+        data.version = version
+    _remember_loaded(filepath, data)
+
+def _commit(data_file, data_list, ops):
+    """
+    在集合锁内落盘一批操作，返回因冲突被拒绝的修改说明。
+    磁盘版本与内存列表加载时的版本不一致时，说明其他会话或进程已经写过，
+    先重新加载最新数据并把本批操作合并上去 (内存列表原地替换为合并结果)，而不是直接覆盖。
+    """
+    backend = get_backend(data_file)
+    conflicts = []
+    with backend.collection_lock as lock:
+        version = lock.read_version()
+        if isinstance(data_list, EntryList) and version != data_list.version:
+            try:
+                fresh, meta = backend.load()
+            except FileNotFoundError: # 文件损坏后已被移走且没有可用备份，按空集合合并
+                fresh, meta = [], {}
+            migrate_entries(data_file, fresh, meta.get('schema_version'))
+            fresh = EntryList(fresh, max(meta.get('next_id') or 1, data_list.next_id))
+            ops, conflicts = _rebase_ops(fresh, ops)
+            data_list[:] = fresh
+            data_list._next_id = fresh.next_id
+        # 先递增版本再写数据: 写到一半崩溃时其他进程只会多做一次合并，而不会覆盖这次写入
+        lock.write_version(version + 1)
+        if ops:
+            backend.apply(data_list, ops)
+    if isinstance(data_list, EntryList):
+        data_list.version = version + 1
+    _remember_loaded(data_file, data_list)
+    return conflicts
+
+def get_next_id(data_list):
+    if isinstance(data_list, EntryList):
+        return data_list.next_id
+    if not data_list:
+        return 1
+    return max(entry.get('id', 0) for entry in data_list if isinstance(entry, dict)) + 1
+
+def _find_entry_index(data_list, entry_id):
+    if isinstance(data_list, EntryList):
+        return data_list.position(entry_id)
+    return next((idx for idx, item in enumerate(data_list) if isinstance(item, dict) and item.get('id') == entry_id), None)
+
+
+# --- 写回批次 ---
+class WriteBehind:
+    """
+    写回缓冲: 批次内的修改先只作用在内存列表上并记录为操作，批次结束时每个集合合并成一次写入。
+    设置了防抖间隔时，距上次落盘不足间隔的集合会延后到间隔结束再写，连续拖动滑块只产生一次磁盘写入。
+    缓冲区在进程内共享，未写出的修改会在下一次批次结束、定时器到期或进程退出时写出。
+    """
+
+    def __init__(self, debounce_seconds=0):
+        self.debounce_seconds = debounce_seconds
+        self._pending = {} # 集合文件 -> (内存列表, 操作列表)
+        self._last_flush = {}
+        self._timers = {}
+        self._lock = threading.RLock()
+        self._conflicts = [] # 定时器线程中写出时产生的冲突，留到下一次 flush 返回给页面
+
+    def record(self, data_file, data_list, op):
+        with self._lock:
+            pending = self._pending.get(data_file)
+            if pending is not None and pending[0] is not data_list:
+                self._flush_file(data_file) # 集合已被重新加载为新列表，先写出旧列表上的修改
+                pending = None
+            if pending is None:
+                pending = self._pending[data_file] = (data_list, [])
+            pending[1].append(op)
+
+    def has_pending(self, data_file):
+        return data_file in self._pending
+
+    def discard(self, data_file, data_list):
+        # 整体保存会覆盖同一列表上尚未写出的操作
+        with self._lock:
+            pending = self._pending.get(data_file)
+            if pending is not None:
+                if pending[0] is data_list:
+                    self._pending.pop(data_file)
+                    self._cancel_timer(data_file)
+                else:
+                    self._flush_file(data_file)
+
+    def flush(self, force=False):
+        """写出到期的集合，返回累计的冲突说明。"""
+        with self._lock:
+            now = time.monotonic()
+            for data_file in list(self._pending):
+                wait = self._last_flush.get(data_file, float('-inf')) + self.debounce_seconds - now
+                if force or wait <= 0:
+                    self._flush_file(data_file)
+                elif data_file not in self._timers:
+                    timer = threading.Timer(wait, self._flush_from_timer, args=(data_file,))
+                    timer.daemon = True
+                    self._timers[data_file] = timer
+                    timer.start()
+            conflicts, self._conflicts = self._conflicts, []
+            return conflicts
+
+    def _flush_from_timer(self, data_file):
+        with self._lock:
+            self._timers.pop(data_file, None)
+            if data_file in self._pending:
+                self._flush_file(data_file)
+
+    def _cancel_timer(self, data_file):
+        timer = self._timers.pop(data_file, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _flush_file(self, data_file):
+        data_list, ops = self._pending.pop(data_file)
+        self._cancel_timer(data_file)
+        self._conflicts.extend(_commit(data_file, data_list, ops))
+        self._last_flush[data_file] = time.monotonic()
+
+
+_write_behind = WriteBehind(WRITE_DEBOUNCE_SECONDS)
+_batch_state = threading.local()
+atexit.register(_write_behind.flush, force=True)
+
+def begin_write_batch():
+    """在当前线程 (即本次 Streamlit 脚本运行) 开启写回批次，之后的修改在 flush_write_batch 时合并写入。"""
+    _batch_state.active = True
+
+def flush_write_batch():
+    """结束当前批次并写出，返回因与其他会话冲突而未保存的修改说明。"""
+    _batch_state.active = False
+    return _write_behind.flush()
+
+def _write(data_file, data_list, *ops):
+    if isinstance(data_list, EntryList):
+        data_list.revision += 1
+        for op in ops:
+            for index in data_list.indexes.values():
+                index.apply(op, data_list)
+    if getattr(_batch_state, 'active', False):
+        for op in ops:
+            _write_behind.record(data_file, data_list, op)
+    else:
+        for conflict in _commit(data_file, data_list, list(ops)):
+            st.warning(conflict)
+
+
+def append_entry(data_list, new_entry, data_file):
+    data_list.append(new_entry)
+    _write(data_file, data_list, {"op": "add", "entry": new_entry})
+
+def append_entries(data_list, new_entries, data_file):
+    """
+    批量追加: 从 next_id 起为所有条目连续分配一段 id (覆盖条目中原有的 id)，并在一次写入中落盘。
+    返回分配的第一个 id。
+    """
+    first_id = get_next_id(data_list)
+    ops = []
+    for offset, entry in enumerate(new_entries):
+        entry['id'] = first_id + offset
+        data_list.append(entry)
+        ops.append({"op": "add", "entry": entry})
+    if ops:
+        _write(data_file, data_list, *ops)
+    return first_id
+
+def update_entry_field(data_list, entry_id, field_name, new_value, data_file): # Renamed for clarity
+    entry_idx = _find_entry_index(data_list, entry_id)
+    if entry_idx is not None:
+        base_value = data_list[entry_idx].get(field_name)
+        data_list[entry_idx][field_name] = new_value
+        _write(data_file, data_list, {"op": "set", "id": entry_id, "field": field_name, "value": new_value, "base": base_value})
+    else:
+        st.error(f"更新失败：未找到 ID 为 {entry_id} 的条目。")
+
+def delete_entry_by_id(data_list, entry_id, data_file):
+    if isinstance(data_list, EntryList):
+        removed = data_list.remove_by_id(entry_id) is not None
+    else:
+        original_len = len(data_list)
+        # Ensure all items are dicts and have 'id' before filtering
+        data_list[:] = [entry for entry in data_list if not (isinstance(entry, dict) and entry.get('id') == entry_id)]
+        removed = len(data_list) < original_len
+    if removed:
+        _write(data_file, data_list, {"op": "del", "id": entry_id})
+        st.success(f"ID 为 {entry_id} 的条目已删除。")
+        return True
+    else:
+        st.warning(f"删除失败：未找到 ID 为 {entry_id} 的条目。")
+        return False
+
+
+# --- 列式视图 ---
+class ColumnarView:
+    """
+    集合的内存列式视图: 以 id 为索引的 DataFrame，状态/类型等为 category 列，日期预先解析，
+    多值字段 (文献分类) 展开为单独的 (entry_id, 值) 表。筛选下拉框、列表筛选和统计图表共用同一份视图。
+    通过 apply 接收与存储后端相同的操作增量更新: 修改直接写入对应单元格，新增和删除先记下，下次读取时一次合并。
+    """
+
+    def __init__(self, data_file, entries):
+        self.fields = SQLITE_INDEXED_FIELDS.get(data_file, [])
+        self.multi_valued = SQLITE_MULTI_VALUED_FIELDS.get(data_file)
+        self._added, self._dropped = [], set()
+        entries = [e for e in entries if isinstance(e, dict)]
+        self._frame = self._build_frame(entries)
+        self._multi = self._build_multi(entries)
+
+    def _build_frame(self, entries):
+        frame = pd.DataFrame([[e.get('id')] + [e.get(f) for f in self.fields if f != 'iso_week'] for e in entries],
+                             columns=['id'] + [f for f in self.fields if f != 'iso_week'])
+        if 'date' in frame:
+            frame['date'] = pd.to_datetime(frame['date'], format="%Y-%m-%d", errors='coerce') # 无效日期为 NaT
+        if 'iso_week' in self.fields:
+            frame['iso_week'] = frame['date'].dt.isocalendar().week.astype('Int64')
+        for f in self.fields:
+            try: frame[f] = frame[f].astype(COLUMN_DTYPES.get(f, object))
+            except (TypeError, ValueError): frame[f] = frame[f].astype(object) # 旧数据中类型不一致的列保持 object
+        return frame.set_index('id')
+
+    def _build_multi(self, entries):
+        if not self.multi_valued:
+            return None
+        list_field, field = self.multi_valued
+        multi = pd.DataFrame([(e.get('id'), value) for e in entries for value in (e.get(list_field) or [])], columns=['entry_id', field])
+        return multi.astype({field: 'category'})
+
+    @property
+    def frame(self):
+        if self._added or self._dropped:
+            frame = self._frame
+            if self._dropped:
+                frame = frame[~frame.index.isin(list(self._dropped))].copy()
+            if self._added:
+                added = self._build_frame(self._added)
+                for f in self.fields:
+                    if COLUMN_DTYPES.get(f) == 'category': # 两边类别一致才能保持 category 类型
+                        dtype = pd.CategoricalDtype(frame[f].cat.categories.union(added[f].cat.categories))
+                        frame, added = frame.astype({f: dtype}), added.astype({f: dtype})
+                frame = pd.concat([frame, added])
+            self._frame, self._added, self._dropped = frame, [], set()
+        return self._frame
+
+    def apply(self, op, data_list=None):
+        if op['op'] == 'add':
+            self._added.append(op['entry'])
+            self._dropped.discard(op['entry'].get('id'))
+            if self.multi_valued:
+                self._set_multi(op['entry'].get('id'), op['entry'].get(self.multi_valued[0]))
+        elif op['op'] == 'del':
+            self._added = [e for e in self._added if e.get('id') != op['id']]
+            self._dropped.add(op['id'])
+            if self.multi_valued:
+                self._set_multi(op['id'], [])
+        elif op['op'] == 'set':
+            if self.multi_valued and op['field'] == self.multi_valued[0]:
+                self._set_multi(op['id'], op['value'])
+            elif op['field'] in self.fields:
+                self._set_cell(op['id'], op['field'], op['value'])
+
+    def _set_cell(self, entry_id, field, value):
+        frame = self.frame # 先合并待处理的新增，保证该条目已在表中
+        if entry_id not in frame.index:
+            return
+        if field == 'date':
+            value = pd.to_datetime(value, format="%Y-%m-%d", errors='coerce')
+            if 'iso_week' in self.fields:
+                frame.loc[entry_id, 'iso_week'] = pd.NA if pd.isna(value) else value.isocalendar()[1]
+        elif COLUMN_DTYPES.get(field) == 'category' and value is not None and value not in frame[field].cat.categories:
+            frame[field] = frame[field].cat.add_categories([value])
+        frame.loc[entry_id, field] = value
+
+    def _set_multi(self, entry_id, values):
+        field = self.multi_valued[1]
+        multi = self._multi[self._multi['entry_id'] != entry_id]
+        if values:
+            added = pd.DataFrame([(entry_id, value) for value in values], columns=['entry_id', field])
+            dtype = pd.CategoricalDtype(multi[field].cat.categories.union(pd.Index(values).unique()))
+            multi = pd.concat([multi.astype({field: dtype}), added.astype({field: dtype})], ignore_index=True)
+        self._multi = multi
+
+    def supports(self, field):
+        return field in self.fields or bool(self.multi_valued and field == self.multi_valued[1])
+
+    def mask(self, filters):
+        frame = self.frame
+        mask = pd.Series(True, index=frame.index)
+        for field, value in filters.items():
+            if self.multi_valued and field == self.multi_valued[1]:
+                mask &= frame.index.isin(self._multi.loc[self._multi[field] == value, 'entry_id'])
+            else:
+                mask &= (frame[field] == value).fillna(False).astype(bool)
+        return mask
+
+    def ids(self, filters):
+        return self.frame.index[self.mask(filters)].tolist()
+
+    def distinct_values(self, field):
+        column = self._multi[field] if self.multi_valued and field == self.multi_valued[1] else self.frame[field]
+        return sorted(set(column.dropna().tolist()))
+
+    def count_by(self, field, filters=None):
+        if self.multi_valued and field == self.multi_valued[1]:
+            multi = self._multi
+            if filters:
+                multi = multi[multi['entry_id'].isin(self.ids(filters))]
+            counts = multi[field].value_counts()
+        else:
+            frame = self.frame
+            counts = (frame[self.mask(filters)] if filters else frame)[field].value_counts()
+        counts = counts[counts > 0] # category 列会列出计数为 0 的类别
+        return dict(zip(counts.index.tolist(), counts.tolist()))
+
+def _derived_index(data_list, data_file, index_class):
+    # EntryList 上的派生索引会被缓存并随 append_entry 等辅助函数增量更新；普通 list 每次临时构建
+    if not isinstance(data_list, EntryList):
+        return index_class(data_file, data_list)
+    index = data_list.indexes.get(index_class)
+    if index is None:
+        index = data_list.indexes[index_class] = index_class(data_file, data_list)
+    return index
+
+def columnar_view(data_list, data_file):
+    """返回集合的列式视图。"""
+    return _derived_index(data_list, data_file, ColumnarView)
+
+
+# --- 全文检索 ---
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|[^\\W{_CJK}_]+")
+
+def tokenize(text, query=False):
+    """
+    切分检索词: 字母数字按单词切分并转小写；中文没有空格分词，连续汉字建索引时切为单字和相邻两字，
+    查询时用两字词 (单个汉字则用单字) 匹配，即可在不依赖分词词典的情况下检索任意中文片段。
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(unicodedata.normalize("NFKC", str(text)).lower()):
+        run = match.group()
+        if match.group(1) is None:
+            tokens.append(run)
+            continue
+        if not query or len(run) == 1:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+class SearchIndex:
+    """
+    集合的内存倒排索引: 词 -> {条目 id: 加权词频}，按 BM25 打分，查询中的所有词都要命中。
+    与列式视图一样通过 apply 接收增删改操作增量维护，只重新索引被修改的那一条。
+    所有存储模式都使用它 (SQLite 自带的 FTS5 分词器不能切分中文)。
+    """
+    K1, B = 1.2, 0.75
+
+    def __init__(self, data_file, entries):
+        self.fields = SEARCH_FIELDS.get(data_file, {})
+        self._postings = {}
+        self._doc_terms = {} # 条目 id -> {词: 加权词频}，删除和重新索引时使用
+        self._doc_lengths = {}
+        self._total_length = 0
+        for entry in entries:
+            if isinstance(entry, dict):
+                self.add(entry)
+
+    def add(self, entry):
+        entry_id = entry.get('id')
+        self.remove(entry_id)
+        terms = Counter()
+        for field, weight in self.fields.items():
+            if entry.get(field):
+                for token in tokenize(entry[field]):
+                    terms[token] += weight
+        self._doc_terms[entry_id] = terms
+        self._doc_lengths[entry_id] = sum(terms.values())
+        self._total_length += self._doc_lengths[entry_id]
+        for token, tf in terms.items():
+            self._postings.setdefault(token, {})[entry_id] = tf
+
+    def remove(self, entry_id):
+        terms = self._doc_terms.pop(entry_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(entry_id)
+        for token in terms:
+            postings = self._postings[token]
+            postings.pop(entry_id, None)
+            if not postings:
+                del self._postings[token]
+
+    def apply(self, op, data_list):
+        if op['op'] == 'add':
+            self.add(op['entry'])
+        elif op['op'] == 'del':
+            self.remove(op['id'])
+        elif op['op'] == 'set' and op['field'] in self.fields:
+            entry = data_list.get_by_id(op['id'])
+            if entry is not None:
+                self.add(entry)
+
+    def search(self, text):
+        """返回 [(条目 id, 得分)]，按得分降序，同分按 id 升序。"""
+        terms = list(dict.fromkeys(tokenize(text, query=True)))
+        if not terms or not self._doc_terms:
+            return []
+        postings = [self._postings.get(term, {}) for term in terms]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        n_docs, avg_length = len(self._doc_terms), self._total_length / len(self._doc_terms) or 1
+        scores = {}
+        for term_postings in postings:
+            idf = math.log(1 + (n_docs - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for entry_id in candidates:
+                tf = term_postings[entry_id]
+                norm = self.K1 * (1 - self.B + self.B * self._doc_lengths[entry_id] / avg_length)
+                scores[entry_id] = scores.get(entry_id, 0) + idf * tf * (self.K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+def search_index(data_list, data_file):
+    """返回集合的倒排索引。"""
+    return _derived_index(data_list, data_file, SearchIndex)
+
+def _entries_by_ids(data_list, entry_ids):
+    if isinstance(data_list, EntryList):
+        entries = (data_list.get_by_id(entry_id) for entry_id in entry_ids)
+    else:
+        by_id = {e.get('id'): e for e in data_list if isinstance(e, dict)}
+        entries = (by_id.get(entry_id) for entry_id in entry_ids)
+    return [e for e in entries if e is not None]
+
+def search_entries(data_list, data_file, text, filters=None):
+    """按相关度排序返回命中 text 且满足 filters 的条目。"""
+    ranked = search_index(data_list, data_file).search(text)
+    return [e for e in _entries_by_ids(data_list, [entry_id for entry_id, _ in ranked]) if _matches(e, filters or {})]
+
+
+# --- 周索引 ---
+# 影响条目所属 (ISO 年, ISO 周) 的字段
+WEEK_SOURCE_FIELDS = ('date', 'week_assigned', 'year_assigned', 'date_added')
+
+def _year_week(entry):
+    # 运动记录由 date 推算；歌单等按周计划的条目为 (year_assigned, week_assigned)，
+    # 缺少 year_assigned 的旧条目取 date_added 所在的 ISO 年
+    if 'date' in entry:
+        try: return tuple(datetime.date.fromisoformat(entry['date']).isocalendar()[:2])
+        except (TypeError, ValueError): return None
+    week, year = entry.get('week_assigned'), entry.get('year_assigned')
+    if not isinstance(week, int):
+        return None
+    if not isinstance(year, int):
+        try: year = datetime.date.fromisoformat(entry.get('date_added')).isocalendar()[0]
+        except (TypeError, ValueError): return None
+    return (year, week)
+
+class WeekIndex:
+    """
+    (ISO 年, ISO 周) -> 条目 id 集合。不同年份的同一周数分开统计；
+    周下拉框、按周筛选和每周统计图只与周数有关，不再逐条解析日期。随增删改增量维护。
+    """
+
+    def __init__(self, data_file, entries):
+        self._weeks = {}
+        self._entry_weeks = {}
+        for entry in entries:
+            if isinstance(entry, dict):
+                self.add(entry)
+
+    def add(self, entry):
+        entry_id = entry.get('id')
+        self.remove(entry_id)
+        key = _year_week(entry)
+        if key is not None:
+            self._entry_weeks[entry_id] = key
+            self._weeks.setdefault(key, set()).add(entry_id)
+
+    def remove(self, entry_id):
+        key = self._entry_weeks.pop(entry_id, None)
+        if key is not None:
+            self._weeks[key].discard(entry_id)
+            if not self._weeks[key]:
+                del self._weeks[key]
+
+    def apply(self, op, data_list):
+        if op['op'] == 'add':
+            self.add(op['entry'])
+        elif op['op'] == 'del':
+            self.remove(op['id'])
+        elif op['op'] == 'set' and op['field'] in WEEK_SOURCE_FIELDS:
+            entry = data_list.get_by_id(op['id'])
+            if entry is not None:
+                self.add(entry)
+
+    def weeks(self): return sorted(self._weeks)
+
+    def ids(self, key): return sorted(self._weeks.get(key, ()), key=lambda entry_id: (entry_id is None, entry_id))
+
+    def counts(self): return {key: len(self._weeks[key]) for key in sorted(self._weeks)}
+
+def week_index(data_list, data_file):
+    """返回集合的 (ISO 年, ISO 周) 索引。"""
+    return _derived_index(data_list, data_file, WeekIndex)
+
+
+# --- 筛选与统计 ---
+# sqlite 模式下直接走带索引的 SQL；其他模式在内存列式视图上完成同样的筛选和计数，视图不支持的字段逐条比较。
+# 按 year_week ((ISO 年, ISO 周)) 筛选和统计在所有模式下都使用内存中的周索引
+def get_sql_backend(data_file, filters=None):
+    """
+    sqlite 模式下且 filters 可以直接转成 SQL 时返回后端，否则返回 None (在内存中筛选)。
+    集合还有防抖延后、尚未写入数据库的修改时也在内存中筛选，否则会读到旧行，页面控件与之不一致又触发修改和重新运行。
+    """
+    backend = get_backend(data_file)
+    if isinstance(backend, SqliteBackend) and 'year_week' not in (filters or {}) and not _write_behind.has_pending(data_file):
+        return backend
+    return None
+
+def _field_value(entry, field):
+    if field == 'year_week':
+        return _year_week(entry)
+    if field == 'iso_week':
+        try: return datetime.date.fromisoformat(entry['date']).isocalendar()[1]
+        except (KeyError, TypeError, ValueError): return None
+    return entry.get(field)
+
+def _matches(entry, filters):
+    for field, value in filters.items():
+        if field == 'category':
+            if value not in entry.get('categories', []): return False
+        elif _field_value(entry, field) != value:
+            return False
+    return True
+
+def _split_filters(view, filters):
+    indexed = {f: v for f, v in (filters or {}).items() if view.supports(f)}
+    return indexed, {f: v for f, v in (filters or {}).items() if f not in indexed}
+
+def query_entries(data_list, data_file, filters):
+    if not filters:
+        return data_list
+    if 'year_week' in filters:
+        rest = {f: v for f, v in filters.items() if f != 'year_week'}
+        return [e for e in _entries_by_ids(data_list, week_index(data_list, data_file).ids(filters['year_week'])) if _matches(e, rest)]
+    backend = get_sql_backend(data_file, filters)
+    if backend is not None:
+        return backend.query(filters)
+    view = columnar_view(data_list, data_file)
+    indexed, rest = _split_filters(view, filters)
+    if indexed and isinstance(data_list, EntryList):
+        entries = [data_list.get_by_id(entry_id) for entry_id in view.ids(indexed)]
+    else:
+        entries, rest = data_list, filters
+    return [e for e in entries if isinstance(e, dict) and _matches(e, rest)]
+
+def query_page(data_list, data_file, filters, page, page_size, descending=False, search=None):
+    """
+    按 id 稳定排序后取第 page 页 (从 1 开始，超出范围时取最后一页)，返回 (符合条件的总数, 当前页条目)。
+    sqlite 模式下用 COUNT 和 LIMIT/OFFSET 只取当前页。给出 search 时只保留全文检索命中的条目，按相关度排序。
+    """
+    backend = get_sql_backend(data_file, filters)
+    if search and search.strip():
+        entries = search_entries(data_list, data_file, search, filters)
+    elif backend is not None:
+        total = backend.count(filters)
+        offset = (min(page, max(1, -(-total // page_size))) - 1) * page_size
+        return total, backend.query(filters, offset, page_size, descending)
+    else:
+        entries = sorted(query_entries(data_list, data_file, filters), key=lambda e: e.get('id', 0), reverse=descending)
+    offset = (min(page, max(1, -(-len(entries) // page_size))) - 1) * page_size
+    return len(entries), entries[offset:offset + page_size]
+
+def distinct_values(data_list, data_file, field):
+    if field == 'year_week':
+        return week_index(data_list, data_file).weeks()
+    backend = get_sql_backend(data_file)
+    if backend is not None:
+        return backend.distinct_values(field)
+    view = columnar_view(data_list, data_file)
+    if view.supports(field):
+        return view.distinct_values(field)
+    values = set(_field_value(entry, field) for entry in data_list)
+    values.discard(None)
+    return sorted(values)
+
+def count_by(data_list, data_file, field, filters=None):
+    """按字段计数，返回按数量降序排列的 {值: 数量}，忽略空值 (与 value_counts 一致)。"""
+    if field == 'year_week' and not filters: # 只需遍历周数
+        return dict(sorted(week_index(data_list, data_file).counts().items(), key=lambda item: -item[1]))
+    backend = get_sql_backend(data_file, filters)
+    if backend is not None and field != 'year_week':
+        return backend.count_by(field, filters)
+    view = columnar_view(data_list, data_file)
+    if view.supports(field) and not _split_filters(view, filters)[1]:
+        return view.count_by(field, filters)
+    entries = query_entries(data_list, data_file, filters)
+    if field == 'category':
+        counts = Counter(cat for entry in entries for cat in entry.get('categories', []))
+    else:
+        counts = Counter(_field_value(entry, field) for entry in entries)
+    counts.pop(None, None)
+    return dict(counts.most_common())
+
+
+# --- 统计结果缓存 ---
+# (集合文件, 名称) -> ((列表 token, revision), 结果)，按最近使用排序。
+# 统计页每次重跑 (包括在其他 tab 点按钮) 都会重新生成所有图表；集合内容未变时直接复用上次的聚合结果和图表对象
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+
+def cached_for_collection(data_list, data_file, name, build):
+    """
+    返回 build() 的结果，集合内容 (EntryList 的 token 与 revision) 不变时复用缓存。
+    普通 list 没有修改计数，每次都重新计算。
+    """
+    if not isinstance(data_list, EntryList) or CHART_CACHE_SIZE <= 0:
+        return build()
+    key, content_key = (data_file, name), (data_list.token, data_list.revision)
+    with _chart_cache_lock:
+        cached = _chart_cache.get(key)
+        if cached is not None and cached[0] == content_key:
+            _chart_cache.move_to_end(key)
+            return cached[1]
+    result = build()
+    with _chart_cache_lock:
+        _chart_cache[key] = (content_key, result)
+        _chart_cache.move_to_end(key)
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] != ["migrate"]:
+        print("用法: python literature_storage.py migrate  (把现有 JSON 文件一次性迁移到 SQLite)")
+        sys.exit(1)
+    STORAGE_MODE = "sqlite"
+    for data_file in DATA_FILES:
+        backend = get_backend(data_file)
+        print(f"{data_file} -> {SQLITE_DB_FILE}:{backend.table} ({len(backend.load()[0])} 条)")